@@ -3,7 +3,8 @@
 Fundamental Pagination Sample.
 """
 import csv
-from typing import List, Tuple
+import threading
+from typing import Callable, List, Sequence, Tuple
 
 
 def index_range(page: int, page_size: int) -> Tuple[int, int]:
@@ -22,23 +23,34 @@ class Server:
     """
     DATA_FILE = "Popular_Baby_Names.csv"
 
-    def __init__(self):
+    def __init__(self, backend: Callable[[str], Sequence] = None):
         """
         Configures a new server instance.
+        `backend` optionally loads the dataset from `DATA_FILE` in place
+        of the default in-memory list, e.g. `dataset_backends.MmapDataset`.
         """
         self.__dataset = None
+        self.__backend = backend
+        self.__lock = threading.Lock()
 
     def dataset(self) -> List[List]:
         """
         saved data set for an improvement of performance.
+        Concurrent first calls share a single load.
         """
-        if self.__dataset is None:
-            with open(self.DATA_FILE) as f:
-                reader = csv.reader(f)
-                dataset = [row for row in reader]
-            self.__dataset = dataset[1:]
+        dataset = self.__dataset
+        if dataset is None:
+            with self.__lock:
+                if self.__dataset is None and self.__backend is not None:
+                    self.__dataset = self.__backend(self.DATA_FILE)
+                if self.__dataset is None:
+                    with open(self.DATA_FILE) as f:
+                        reader = csv.reader(f)
+                        dataset = [row for row in reader]
+                    self.__dataset = dataset[1:]
+                dataset = self.__dataset
 
-        return self.__dataset
+        return dataset
 
     def get_page(self, page: int = 1, page_size: int = 10) -> List[List]:
         """
@@ -4,9 +4,25 @@ Fundamental Pagination Sample.
 """
 import math
 import csv
-from typing import List, Tuple
+import threading
+from itertools import islice
+from time import perf_counter
+from typing import Callable, Iterator, List, Mapping, Optional, Sequence, Tuple
 from typing import Dict
 
+from aggregates import NameAggregates
+from bulk_export import FORMATS, read_header, stream
+from csv_tail import CsvTail
+from dataset_backends import reload_on_stale
+from instrumentation import timed
+from name_search import NameSearch
+from page_cache import PageCache
+from secondary_index import (FILTER_COLUMNS, SecondaryIndex, normalize,
+                             query_key)
+from shared_dataset import attach, segment_name
+from snapshot import is_fresh, load_or_build
+from sort_index import SORT_KEYS, SortIndex
+
 
 def index_range(page: int, page_size: int) -> Tuple[int, int]:
     """
@@ -23,51 +39,448 @@ class Server:
     Server Class for Managing and Paginating Baby Names Database Records.
     """
     DATA_FILE = "Popular_Baby_Names.csv"
+    PAGE_CACHE_SIZE = 256
 
-    def __init__(self):
+    def __init__(self, backend: Callable[[str], Sequence] = None,
+                 snapshot: bool = False, shared_memory: bool = False,
+                 metrics=None):
         """
         Configures a new server instance.
+        `backend` optionally loads the dataset from `DATA_FILE` in place
+        of the default in-memory list, e.g. `dataset_backends.MmapDataset`.
+        With `snapshot`, the columnar dataset and its secondary index are
+        mapped from a binary snapshot, written on the first parse.
+        With `shared_memory`, they are attached read-only from the segment
+        published by `shared_dataset.publish(DATA_FILE)`, or loaded as with
+        `snapshot` if `DATA_FILE` changed since the segment was published.
+        `metrics` is an optional sink, e.g. `instrumentation.MemorySink`,
+        receiving load, index build and page fetch timings.
         """
         self.__dataset = None
+        self.__backend = backend
+        self.__snapshot = snapshot
+        self.__shared_memory = shared_memory
+        self.__secondary_index = None
+        self.__sort_index = None
+        self.__name_search = None
+        self.__aggregates = None
+        self.__tail = None
+        self.__source = None
+        self.__version = 0
+        self.__lock = threading.RLock()
+        self.__page_cache = PageCache(self.PAGE_CACHE_SIZE)
+        self.__metrics = metrics
 
     def dataset(self) -> List[List]:
         """
         saved data set for an improvement of performance.
+        Concurrent first calls share a single load.
+        """
+        dataset = self.__dataset
+        if dataset is None:
+            with self.__lock:
+                if self.__dataset is None:
+                    with timed(self.__metrics, "pagination_load_seconds"):
+                        self.__load()
+                dataset = self.__dataset
+
+        return dataset
+
+    def __load(self) -> None:
+        """
+        Loads `DATA_FILE` in the configured mode and starts following it.
         """
-        if self.__dataset is None:
+        tail = CsvTail(self.DATA_FILE)
+        source = None
+        if self.__shared_memory:
+            loaded = attach(segment_name(self.DATA_FILE))
+            if not is_fresh(self.DATA_FILE, loaded[2]):
+                loaded = load_or_build(self.DATA_FILE)
+            self.__dataset, self.__secondary_index, source = loaded
+        elif self.__snapshot:
+            self.__dataset, self.__secondary_index, source = load_or_build(
+                self.DATA_FILE)
+        elif self.__backend is not None:
+            self.__dataset = self.__backend(self.DATA_FILE)
+        else:
             with open(self.DATA_FILE) as f:
                 reader = csv.reader(f)
                 dataset = [row for row in reader]
             self.__dataset = dataset[1:]
+        tail.mark(source["size"] if source else None)
+        self.__tail = tail
+        self.__source = source
 
-        return self.__dataset
+    def dataset_version(self) -> int:
+        """
+        Number of the loaded dataset, bumped by every reload.
+        """
+        return self.__version
 
-    def get_page(self, page: int = 1, page_size: int = 10) -> List[List]:
+    def dataset_identity(self) -> Optional[Tuple]:
         """
-        saves data from corresponding data set.
+        Identity of the loaded content of `DATA_FILE`, the same in every
+        process that loaded it: its inode, loaded size and modification
+        time, or None if it changed while being loaded. Datasets mapped
+        from a snapshot or shared memory, which may predate the file,
+        are named by the digest recorded in them and the loaded size.
+        """
+        with self.__lock:
+            self.dataset()
+            if self.__source is not None and self.__tail.offset is not None:
+                return (self.__source["sha256"], self.__tail.offset)
+            return self.__tail.identity
+
+    def reload(self) -> None:
+        """
+        Drops the loaded dataset and indexes so the next call re-reads
+        `DATA_FILE`; cached pages of the old dataset are never served.
+        """
+        with self.__lock:
+            self.__dataset = None
+            self.__secondary_index = None
+            self.__sort_index = None
+            self.__name_search = None
+            self.__aggregates = None
+            self.__version += 1
+            self.__page_cache.clear()
+
+    def refresh(self) -> bool:
+        """
+        Picks up rows appended to `DATA_FILE` since it was loaded: only
+        the new bytes are parsed, and the dataset, secondary index and
+        name totals are extended in place, while sort orders and the name
+        search index are rebuilt on next use. Falls back to a full reload
+        if the file was truncated or rewritten, or if the dataset cannot
+        be extended (a custom backend without `extend`). Returns True if
+        data changed.
+        With `snapshot` or `shared_memory`, the first refresh bringing new
+        rows copies the mapped columns into private arrays, so this
+        process stops sharing them; to keep one copy per host, publish a
+        new snapshot or segment and `reload` instead.
+        """
+        with self.__lock:
+            if self.__dataset is None:
+                return False
+            rows = self.__tail.read_appended()
+            if rows == []:
+                return False
+            if rows is None or not hasattr(self.__dataset, "extend"):
+                self.reload()
+                return True
+            self.__dataset.extend(rows)
+            if self.__secondary_index is not None:
+                self.__secondary_index.extend(rows)
+            if self.__aggregates is not None:
+                self.__aggregates.extend(rows)
+            self.__sort_index = None
+            self.__name_search = None
+            self.__version += 1
+            return True
+
+    def cache_stats(self) -> Dict:
+        """
+        Hit/miss counters and occupancy of the page response cache.
+        """
+        return self.__page_cache.stats()
+
+    def secondary_index(self) -> SecondaryIndex:
+        """
+        Posting lists of the dataset by Year, Gender, Ethnicity and Name,
+        built on first use.
+        """
+        index = self.__secondary_index
+        if index is None:
+            with self.__lock:
+                if self.__secondary_index is None:
+                    dataset = self.dataset()
+                    with timed(self.__metrics,
+                               "pagination_index_build_seconds",
+                               index="secondary"):
+                        self.__secondary_index = SecondaryIndex(dataset)
+                index = self.__secondary_index
+        return index
+
+    def sort_index(self) -> SortIndex:
+        """
+        Sort permutations of the dataset, each built on first use.
+        """
+        index = self.__sort_index
+        if index is None:
+            with self.__lock:
+                if self.__sort_index is None:
+                    self.__sort_index = SortIndex(self.dataset(),
+                                                  metrics=self.__metrics)
+                index = self.__sort_index
+        return index
+
+    def name_search(self) -> NameSearch:
+        """
+        Prefix and substring index of the names, built on first use.
+        """
+        search = self.__name_search
+        if search is None:
+            with self.__lock:
+                if self.__name_search is None:
+                    index = self.secondary_index()
+                    with timed(self.__metrics,
+                               "pagination_index_build_seconds",
+                               index="names"):
+                        self.__name_search = NameSearch(index)
+                search = self.__name_search
+        return search
+
+    @reload_on_stale
+    def search_names(self, pattern: str, page: int = 1,
+                     page_size: int = 10) -> Dict:
+        """
+        Pages through the rows whose name matches `pattern`, where `*`
+        stands for any characters: "Oliv*" (prefix), "*liv*" (substring)
+        or "Olivia" (exact), ignoring case. Rows come ordered by name and
+        then by position, with the `get_hyper` keys; they are found from
+        the name index, without scanning the dataset.
+        """
+        assert type(pattern) == str
+        assert type(page) == int and type(page_size) == int
+        assert page > 0 and page_size > 0
+        key = (page, page_size, "names", normalize(pattern))
+        version = self.__version
+        hyper = self.__page_cache.get(key, version)
+        if hyper is None:
+            data = self.dataset()
+            search = self.name_search()
+            start, end = index_range(page, page_size)
+            total = search.count(pattern)
+            rows = [data[pos]
+                    for pos in search.positions(pattern, start, end)]
+            hyper = {
+                'page_size': len(rows),
+                'page': page,
+                'data': rows,
+                'next_page': page + 1 if end < total else None,
+                'prev_page': page - 1 if start > 0 else None,
+                'total_pages': math.ceil(total / page_size)
+            }
+            self.__page_cache.put(key, version, hyper)
+        return hyper
+
+    def aggregates(self) -> NameAggregates:
+        """
+        Count totals of every name per year, gender and ethnicity,
+        built on first use.
+        """
+        aggregates = self.__aggregates
+        if aggregates is None:
+            with self.__lock:
+                if self.__aggregates is None:
+                    dataset = self.dataset()
+                    with timed(self.__metrics,
+                               "pagination_index_build_seconds",
+                               index="aggregates"):
+                        self.__aggregates = NameAggregates(dataset)
+                aggregates = self.__aggregates
+        return aggregates
+
+    @reload_on_stale
+    def get_top_names(self, page: int = 1, page_size: int = 10,
+                      filters: Mapping = None) -> Dict:
+        """
+        Pages through the names ranked by total Count over the rows
+        matching `filters` (year, gender, ethnicity), e.g. the top names
+        of {"year": 2016, "gender": "FEMALE"}. Rows are [name, total,
+        rank], with the `get_hyper` keys; totals are precomputed.
         """
         assert type(page) == int and type(page_size) == int
         assert page > 0 and page_size > 0
+        ranking = self.aggregates().top(filters)
         start, end = index_range(page, page_size)
-        data = self.dataset()
-        if start > len(data):
+        rows = [list(row) for row in ranking[start:end]]
+        return {
+            'page_size': len(rows),
+            'page': page,
+            'data': rows,
+            'next_page': page + 1 if end < len(ranking) else None,
+            'prev_page': page - 1 if start > 0 else None,
+            'total_pages': math.ceil(len(ranking) / page_size)
+        }
+
+    def __matching(self, filters: Optional[Mapping],
+                   sort: Optional[str]) -> Tuple[Sequence, bool]:
+        """
+        Positions of the rows matching `filters`, in `sort` order, and
+        True; or the whole dataset, in file order, and False.
+        """
+        assert sort is None or sort in SORT_KEYS
+        if not filters and sort is None:
+            return self.dataset(), False
+        if not filters:
+            return self.sort_index().permutation(sort), True
+        assert all(column in FILTER_COLUMNS for column in filters)
+        matching = self.secondary_index().lookup(filters)
+        if sort is not None:
+            matching = self.sort_index().order(matching, sort,
+                                               query_key(filters))
+        return matching, True
+
+    def __page_rows(self, data: Sequence, matching: Sequence,
+                    positions: bool, start: int, end: int) -> List[List]:
+        """
+        Rows `start` to `end` of `matching`, either positions of rows of
+        `data` (filtered or sorted) or `data` itself.
+        """
+        if start > len(matching):
             return []
+        if positions:
+            return [data[pos] for pos in matching[start:end]]
         return data[start:end]
 
-    def get_hyper(self, page: int = 1, page_size: int = 10) -> Dict:
+    @reload_on_stale
+    def get_page(self, page: int = 1, page_size: int = 10,
+                 filters: Mapping = None, sort: str = None) -> List[List]:
+        """
+        saves data from corresponding data set.
+        `filters` maps column names (year, gender, ethnicity, name) to the
+        value rows must hold, e.g. {"gender": "FEMALE", "year": 2016}.
+        `sort` orders the rows by a column, e.g. "name", or "-count" for
+        descending counts, using a permutation precomputed once.
+        """
+        assert type(page) == int and type(page_size) == int
+        assert page > 0 and page_size > 0
+        metrics = self.__metrics
+        if metrics is not None:
+            started = perf_counter()
+        start, end = index_range(page, page_size)
+        data = self.dataset()
+        matching, positions = self.__matching(filters, sort)
+        rows = self.__page_rows(data, matching, positions, start, end)
+        if metrics is not None:
+            metrics.observe("pagination_page_fetch_seconds",
+                            perf_counter() - started, method="get_page")
+            metrics.inc("pagination_pages_total", method="get_page")
+        return rows
+
+    def get_hyper(self, page: int = 1, page_size: int = 10,
+                  filters: Mapping = None, sort: str = None) -> Dict:
         """
         Retrieves information about a specified page,
         including key metadata like title, description,
         author, and publication date, for use in analysis or reporting.
+        With `filters`, the page and its metadata cover matching rows only;
+        with `sort`, rows are ordered as in `get_page`.
+        Responses are cached per page, page size, filters, sort and version.
+        """
+        return self.get_pages([(page, page_size)], filters, sort)[0]
+
+    @reload_on_stale
+    def get_pages(self, pages: Sequence[Tuple[int, int]],
+                  filters: Mapping = None, sort: str = None) -> List[Dict]:
+        """
+        Returns the `get_hyper` response of every (page, page_size) pair,
+        e.g. to prefetch the previous, current and next pages at once.
+        The arguments are validated, and the dataset and filter index
+        looked up, once for the whole batch.
+        """
+        for page, page_size in pages:
+            assert type(page) == int and type(page_size) == int
+            assert page > 0 and page_size > 0
+        metrics = self.__metrics
+        if metrics is not None:
+            started = perf_counter()
+        filter_key = query_key(filters) if filters else None
+        version = self.__version
+        data = self.dataset()
+        matching, positions = self.__matching(filters, sort)
+        responses = []
+        for page, page_size in pages:
+            key = (page, page_size, filter_key, sort)
+            hyper = self.__page_cache.get(key, version)
+            if hyper is None:
+                hyper = self.__build_hyper(page, page_size, data, matching,
+                                           positions)
+                self.__page_cache.put(key, version, hyper)
+            responses.append(hyper)
+        if metrics is not None:
+            metrics.observe("pagination_page_fetch_seconds",
+                            perf_counter() - started, method="get_pages")
+            metrics.inc("pagination_pages_total", len(pages),
+                        method="get_pages")
+        return responses
+
+    def __build_hyper(self, page: int, page_size: int, data: Sequence,
+                      matching: Sequence, positions: bool) -> Dict:
+        """
+        Builds the `get_hyper` response of a validated page.
         """
-        data = self.get_page(page, page_size)
         start, end = index_range(page, page_size)
-        total_pages = math.ceil(len(self.__dataset) / page_size)
+        rows = self.__page_rows(data, matching, positions, start, end)
+        total = len(matching)
+        total_pages = math.ceil(total / page_size)
         return {
-            'page_size': len(data),
+            'page_size': len(rows),
             'page': page,
-            'data': data,
-            'next_page': page + 1 if end < len(self.__dataset) else None,
+            'data': rows,
+            'next_page': page + 1 if end < total else None,
             'prev_page': page - 1 if start > 0 else None,
             'total_pages': total_pages
         }
+
+    def export(self, fmt: str = "ndjson", filters: Mapping = None,
+               sort: str = None, chunk_size: int = 1000) -> Iterator[str]:
+        """
+        Streams every row matching `filters`, in `sort` order, as NDJSON
+        or as CSV with the file header, yielding one encoded string per
+        `chunk_size` rows. Rows are only read as the consumer pulls them,
+        from the rows that matched when `export` was called.
+        Raises ValueError for an unknown format, filter column or sort
+        key, or a chunk size that is not a positive integer.
+        """
+        if fmt not in FORMATS:
+            raise ValueError("Unknown export format: {}".format(fmt))
+        if type(chunk_size) != int or chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+        for column in filters or ():
+            if column not in FILTER_COLUMNS:
+                raise ValueError("Unknown filter column: {}".format(column))
+        if sort is not None and sort not in SORT_KEYS:
+            raise ValueError("Unknown sort key: {}".format(sort))
+        data = self.dataset()
+        matching, positions = self.__matching(filters, sort)
+        header = read_header(self.DATA_FILE) if fmt == "csv" else None
+        return stream(self.__chunks(data, matching, positions, chunk_size),
+                      fmt, header)
+
+    def __chunks(self, data: Sequence, matching: Sequence, positions: bool,
+                 chunk_size: int) -> Iterator[List[List]]:
+        """
+        Yields the rows of `matching` `chunk_size` at a time.
+        """
+        total = len(matching)
+        for start in range(0, total, chunk_size):
+            end = min(start + chunk_size, total)
+            yield self.__page_rows(data, matching, positions, start, end)
+
+    def iter_pages(self, page_size: int = 10) -> Iterator[Dict]:
+        """
+        Streams every page of `DATA_FILE` straight from the CSV reader,
+        holding at most two pages in memory and never the whole dataset.
+        Each page has the `get_hyper` keys; `total_pages` is only known,
+        and only set, once the last page is reached.
+        """
+        assert type(page_size) == int and page_size > 0
+        with open(self.DATA_FILE) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            page = 1
+            data = list(islice(reader, page_size))
+            while data:
+                following = list(islice(reader, page_size))
+                yield {
+                    'page_size': len(data),
+                    'page': page,
+                    'data': data,
+                    'next_page': page + 1 if following else None,
+                    'prev_page': page - 1 if page > 1 else None,
+                    'total_pages': None if following else page
+                }
+                data = following
+                page += 1
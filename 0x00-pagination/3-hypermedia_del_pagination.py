@@ -5,63 +5,417 @@ Deletion-resilient hypermedia pagination
 
 import csv
 import math
-from typing import List, Dict, Tuple
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import (Callable, Dict, Iterable, Iterator, List, MutableMapping,
+                    Optional, Sequence, Tuple)
+
+from aggregates import NameAggregates
+from bulk_export import FORMATS, read_header, stream
+from csv_tail import CsvTail
+from dataset_backends import reload_on_stale
+from deletion_index import DatasetView, IndexedDataset, TombstoneIndex
+from instrumentation import timed
+from mvcc import VersionRegistry
+from page_cache import PageCache
+from secondary_index import FILTER_COLUMNS, query_key, row_matches
+from sort_index import SortIndex
 
 
 class Server:
     """Server class to paginate a database of popular baby names.
     """
     DATA_FILE = "Popular_Baby_Names.csv"
+    PAGE_CACHE_SIZE = 256
+    MAX_SNAPSHOTS = 16
+    SNAPSHOT_TTL = 300.0
 
-    def __init__(self):
+    def __init__(self, backend: Callable[[str], Sequence] = None,
+                 metrics=None):
+        """`metrics` is an optional sink, e.g. `instrumentation.MemorySink`,
+        receiving load, index build and page fetch timings and the number
+        of deleted rows skipped.
+        """
         self.__dataset = None
-        self.__indexed_dataset = None
+        self.__published = None
+        self.__indexed_dataset = DatasetView(self.__current, self.delete)
+        self.__backend = backend
+        self.__tail = None
+        self.__generation = 0
+        self.__sort_index = None
+        self.__aggregates = None
+        self.__lock = threading.RLock()
+        self.__page_cache = PageCache(self.PAGE_CACHE_SIZE)
+        self.__snapshots = VersionRegistry(self.MAX_SNAPSHOTS,
+                                           self.SNAPSHOT_TTL)
+        self.__metrics = metrics
 
     def dataset(self) -> List[List]:
-        """Cached dataset
+        """Cached dataset, loaded once even by concurrent first calls
+        """
+        dataset = self.__dataset
+        if dataset is None:
+            with self.__lock:
+                if self.__dataset is None:
+                    with timed(self.__metrics, "pagination_load_seconds"):
+                        self.__load()
+                dataset = self.__dataset
+
+        return dataset
+
+    def __load(self) -> None:
+        """Loads `DATA_FILE` and starts following it for appended rows
         """
-        if self.__dataset is None:
+        tail = CsvTail(self.DATA_FILE)
+        if self.__backend is not None:
+            self.__dataset = self.__backend(self.DATA_FILE)
+        else:
             with open(self.DATA_FILE) as f:
                 reader = csv.reader(f)
                 dataset = [row for row in reader]
             self.__dataset = dataset[1:]
+        tail.mark()
+        self.__tail = tail
 
-        return self.__dataset
+    def indexed_dataset(self) -> MutableMapping[int, List]:
+        """Dataset indexed by sorting position, starting at 0.
+        Deleting a key leaves a tombstone, so later positions never shift.
 
-    def indexed_dataset(self) -> Dict[int, List]:
-        """Dataset indexed by sorting position, starting at 0
+        The mapping is a live view of the current version: deleting a
+        key goes through `delete`, and like `refresh` and `reload` it
+        builds a new version and swaps it in, never modifying one that a
+        reader or a cursor holds. `current()` returns that immutable
+        version, consistent without taking any lock.
         """
-        if self.__indexed_dataset is None:
-            dataset = self.dataset()
-            truncated_dataset = dataset[:1000]
-            self.__indexed_dataset = {
-                i: dataset[i] for i in range(len(dataset))
-            }
         return self.__indexed_dataset
 
-    def get_hyper_index(self, index: int = None, page_size: int = 10) -> Dict:
+    def __current(self) -> IndexedDataset:
+        """The current version of the indexed dataset, built on first use
+        """
+        indexed = self.__published
+        if indexed is None:
+            with self.__lock:
+                if self.__published is None:
+                    dataset = self.dataset()
+                    with timed(self.__metrics,
+                               "pagination_index_build_seconds",
+                               index="tombstones"):
+                        self.__published = IndexedDataset(
+                            dataset, generation=self.__generation)
+                indexed = self.__published
+        return indexed
+
+    def delete(self, index: int) -> None:
+        """Deletes the row at position `index`.
+        Raises KeyError if it does not exist or was already deleted.
+        """
+        self.delete_many([index])
+
+    def delete_many(self, indexes: Iterable[int]) -> None:
+        """Deletes the rows at every position of `indexes` at once.
+        Raises KeyError, deleting nothing, if one of them does not exist
+        or was already deleted.
+
+        The tombstones, and their sorted layouts, are copied
+        (O(n / block_size) each), updated, and published with a single
+        reference swap, so concurrent `get_hyper_index` calls are never
+        blocked.
+        """
+        with self.__lock:
+            updated = self.__current().copy()
+            deleted = []
+            for index in indexes:
+                del updated[index]
+                deleted.append(index)
+            if self.__aggregates is not None:
+                self.__aggregates.remove(
+                    updated.dataset[index] for index in deleted)
+            self.__published = updated
+
+    def aggregates(self) -> NameAggregates:
+        """Count totals of every live name per year, gender and
+        ethnicity, built on first use and kept up to date by deletions
+        and appended rows.
+        """
+        aggregates = self.__aggregates
+        if aggregates is None:
+            with self.__lock:
+                if self.__aggregates is None:
+                    indexed = self.__current()
+                    tombstones = indexed.tombstones
+                    with timed(self.__metrics,
+                               "pagination_index_build_seconds",
+                               index="aggregates"):
+                        aggregates = NameAggregates(indexed.dataset,
+                                                    tombstones.size)
+                        aggregates.remove(indexed.dataset[pos]
+                                          for pos in tombstones.deleted())
+                    self.__aggregates = aggregates
+                aggregates = self.__aggregates
+        return aggregates
+
+    @reload_on_stale
+    def get_top_names(self, index: int = 0, page_size: int = 10,
+                      filters: Dict = None) -> Dict:
+        """Pages through the names ranked by total Count over the live
+        rows matching `filters` (year, gender, ethnicity), starting at
+        rank position `index`. Rows are [name, total, rank], with the
+        `get_hyper_index` keys.
+        """
+        assert type(page_size) == int and page_size > 0
+        ranking = self.aggregates().top(filters)
+        if index is None or index < 0 or index > max(len(ranking) - 1, 0):
+            raise IndexError("Index out of range")
+        rows = [list(row) for row in ranking[index:index + page_size]]
+        return {
+            "index": index,
+            "next_index": index + len(rows),
+            "page_size": len(rows),
+            "data": rows
+        }
+
+    def dataset_version(self) -> int:
+        """Version of the served data within the loaded content of
+        `DATA_FILE`: the digest of the deleted positions, the same in
+        every process that deleted the same rows, unlike the in-process
+        `(generation, deletions)` version keying cached pages.
+        """
+        return self.__current().tombstones.digest
+
+    def dataset_identity(self) -> Optional[Tuple[int, int, int]]:
+        """Identity of the loaded content of `DATA_FILE`, the same in
+        every process that loaded it: its inode, loaded size and
+        modification time, or None if it changed while being loaded.
+        """
+        with self.__lock:
+            self.dataset()
+            return self.__tail.identity
+
+    def reload(self) -> None:
+        """Drops the dataset and its tombstones so the next call re-reads
+        `DATA_FILE`; cached pages of the old dataset are never served.
+        """
+        with self.__lock:
+            self.__dataset = None
+            self.__published = None
+            self.__sort_index = None
+            self.__aggregates = None
+            self.__generation += 1
+            self.__page_cache.clear()
+
+    def refresh(self) -> bool:
+        """Picks up rows appended to `DATA_FILE` since it was loaded,
+        parsing only the new bytes; they become live positions after the
+        existing ones, so deletions and indexes handed out stay valid.
+        Falls back to a full reload if the file was truncated or rewritten
+        or the dataset cannot be extended. Returns True if data changed.
+        A ColumnarDataset mapped from a snapshot or shared memory copies
+        its columns into private arrays on the first refresh bringing new
+        rows, and stops sharing them with other processes.
+        """
+        with self.__lock:
+            if self.__dataset is None:
+                return False
+            rows = self.__tail.read_appended()
+            if rows == []:
+                return False
+            if rows is None or not hasattr(self.__dataset, "extend"):
+                self.reload()
+                return True
+            self.__dataset.extend(rows)
+            if self.__aggregates is not None:
+                self.__aggregates.extend(rows)
+            self.__generation += 1
+            current = self.__published
+            if current is not None:
+                tombstones = current.tombstones.copy()
+                tombstones.extend(len(rows))
+                self.__published = IndexedDataset(
+                    current.dataset, tombstones, self.__generation)
+            return True
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters and occupancy of the page response cache.
+        """
+        return self.__page_cache.stats()
+
+    def __sorted(self, dataset: IndexedDataset,
+                 sort: str) -> Tuple[TombstoneIndex, Sequence[int]]:
+        """Tombstones of `dataset` in `sort` order and the permutation
+        mapping those sorted indexes back to row positions.
+        Raises ValueError for an unknown sort key.
+        """
+        cached = self.__sort_index
+        if cached is None or cached[0] != dataset.generation:
+            with self.__lock:
+                cached = self.__sort_index
+                if cached is None or cached[0] != dataset.generation:
+                    cached = (dataset.generation, SortIndex(
+                        dataset.dataset, dataset.tombstones.size,
+                        self.__metrics))
+                    if dataset.generation == self.__generation:
+                        self.__sort_index = cached
+        sort_index = cached[1]
+        tombstones = dataset.ordered(sort, sort_index.inverse(sort))
+        return tombstones, sort_index.permutation(sort)
+
+    def get_hyper_index(self, index: int = None, page_size: int = 10,
+                        sort: str = None) -> Dict:
         """
         this part of the code allows for
         the pagination to be deletion-resiliant
-        by allowing acess by index even if items are removed
+        by allowing acess by index even if items are removed.
+        Deleted ranges are skipped with rank/select jumps on the
+        tombstone index, not one probe per deleted row.
+        With `sort` (e.g. "name", or "-count" for descending counts),
+        indexes count positions in that order rather than file order.
+        Responses are cached per index, page size, sort and version.
         """
+        return self.get_hyper_indexes([(index, page_size)], sort)[0]
 
-        dataset = self.indexed_dataset()
-        data_length = len(dataset)
-        if index is None or index < 0 or index >= data_length:
-            raise IndexError("Index out of range")
+    @reload_on_stale
+    def get_hyper_indexes(self, pages: Sequence[Tuple[int, int]],
+                          sort: str = None) -> List[Dict]:
+        """
+        Returns the `get_hyper_index` response of every (index, page_size)
+        pair. The batch is validated and the tombstones looked up once,
+        and pages whose ranges overlap or touch share one forward scan.
+        """
+        return self.__hyper_indexes(self.__current(), pages, sort)
+
+    def __hyper_indexes(self, dataset: IndexedDataset,
+                        pages: Sequence[Tuple[int, int]],
+                        sort: str = None) -> List[Dict]:
+        """Pages of `get_hyper_indexes` read from the given version.
+        """
+        metrics = self.__metrics
+        if metrics is not None:
+            started = perf_counter()
+            skipped = 0
+        tombstones = dataset.tombstones
+        permutation = None
+        if sort is not None:
+            tombstones, permutation = self.__sorted(dataset, sort)
+        data_length = tombstones.size
+        for index, page_size in pages:
+            assert type(page_size) == int and page_size > 0
+            if index is None or index < 0 or index >= data_length:
+                raise IndexError("Index out of range")
+
+        # The version is part of the key, so pages of a version pinned by
+        # a cursor and of the current one are cached side by side.
+        version = dataset.version
+        responses = {}
+        scan = []
+        scan_start = scan_end = None
+        for index, page_size in sorted(set(pages)):
+            key = (index, page_size, sort, version)
+            hyper = self.__page_cache.get(key, version)
+            if hyper is None:
+                if scan_end is None or index > scan_end:
+                    scan, scan_start, scan_end = [], index, index
+                first = bisect_left(scan, index)
+                missing = first + page_size - len(scan)
+                if missing > 0 and scan_end < data_length:
+                    more = tombstones.live_range(scan_end, missing)
+                    scan.extend(more)
+                    scan_end = data_length
+                    if len(more) == missing:
+                        scan_end = more[-1] + 1
+                positions = scan[first:first + page_size]
+                hyper = self.__build_hyper_index(
+                    index, page_size, positions, dataset.dataset, data_length,
+                    permutation)
+                self.__page_cache.put(key, version, hyper)
+                if metrics is not None:
+                    skipped += hyper["next_index"] - index - len(positions)
+            responses[key] = hyper
+        if metrics is not None:
+            metrics.observe("pagination_page_fetch_seconds",
+                            perf_counter() - started,
+                            method="get_hyper_indexes")
+            metrics.inc("pagination_pages_total", len(pages),
+                        method="get_hyper_indexes")
+            metrics.inc("pagination_rows_skipped_total", skipped)
+        return [responses[(index, page_size, sort, version)]
+                for index, page_size in pages]
+
+    @reload_on_stale
+    def get_hyper_cursor(self, index: int = 0, page_size: int = 10,
+                         cursor: str = None) -> Dict:
+        """Snapshot-isolated `get_hyper_index`.
+        Without `cursor`, pins the current version of the dataset and
+        returns its opaque token under "cursor"; passing that token back
+        with the returned `next_index` keeps reading the same version,
+        unaffected by later deletions, until the cursor expires.
+        Raises ValueError for an unknown or expired cursor.
+        """
+        if cursor is None:
+            indexed = self.__current()
+            cursor = self.__snapshots.pin(indexed.version, indexed)
+        else:
+            indexed = self.__snapshots.lookup(cursor)
+            if indexed is None:
+                raise ValueError("Unknown or expired cursor")
+        hyper = self.__hyper_indexes(indexed, [(index, page_size)])[0]
+        hyper["cursor"] = cursor
+        return hyper
 
-        page_data = []
-        next_index = index
-        while len(page_data) < page_size and next_index < data_length:
-            item = dataset.get(next_index)
-            if item:
-                page_data.append(item)
-            next_index += 1
+    def export(self, fmt: str = "ndjson", filters: Dict = None,
+               chunk_size: int = 1000) -> Iterator[str]:
+        """Streams every live row matching `filters` (year, gender,
+        ethnicity, name) as NDJSON or as CSV with the file header,
+        yielding one encoded string per `chunk_size` live rows scanned.
+        The export reads the version current when it is called, so
+        deletions made while it is consumed do not affect it.
+        Raises ValueError for an unknown format or filter column, or a
+        chunk size that is not a positive integer.
+        """
+        if fmt not in FORMATS:
+            raise ValueError("Unknown export format: {}".format(fmt))
+        if type(chunk_size) != int or chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+        for column in filters or ():
+            if column not in FILTER_COLUMNS:
+                raise ValueError("Unknown filter column: {}".format(column))
+        key = query_key(filters) if filters else None
+        header = read_header(self.DATA_FILE) if fmt == "csv" else None
+        chunks = self.__export_chunks(self.__current(), key,
+                                      chunk_size)
+        return stream(chunks, fmt, header)
+
+    def __export_chunks(self, dataset: IndexedDataset, key: Tuple,
+                        chunk_size: int) -> Iterator[List[List]]:
+        """Yields the live rows of `dataset` matching the filters `key`,
+        scanning `chunk_size` live positions at a time.
+        """
+        tombstones = dataset.tombstones
+        positions = tombstones.live_range(0, chunk_size)
+        while positions:
+            rows = [dataset.dataset[pos] for pos in positions]
+            if key:
+                rows = [row for row in rows if row_matches(row, key)]
+            yield rows
+            positions = tombstones.live_range(positions[-1] + 1,
+                                              chunk_size)
+
+    def __build_hyper_index(self, index: int, page_size: int,
+                            positions: List[int], rows: Sequence,
+                            data_length: int,
+                            permutation: Sequence[int] = None) -> Dict:
+        """Builds the `get_hyper_index` response of the live `positions`
+        found from `index`, mapped to rows through `permutation` if sorted.
+        """
+        next_index = data_length
+        if len(positions) == page_size:
+            next_index = positions[-1] + 1
+        if permutation is not None:
+            positions = [permutation[pos] for pos in positions]
 
         return {
             "index": index,
             "next_index": next_index,
-            "page_size": len(page_data),
-            "data": page_data
+            "page_size": len(positions),
+            "data": [rows[pos] for pos in positions]
         }
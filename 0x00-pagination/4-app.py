@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+HTTP front end of the pagination servers.
+
+`GET /pages` serves `get_hyper` and `GET /indexes` serves
+`get_hyper_index` as JSON. Every response carries a strong ETag derived
+from the identity of the loaded file (the same in every worker and
+across restarts), the dataset version (for `/indexes`, the digest of
+the deleted rows, so workers that deleted different rows never share
+an ETag), the request parameters and the content coding, so a
+conditional GET that still matches is answered with 304 before the
+page is even built. Pages of
+at least `STREAM_MIN_ROWS` rows are streamed, gzip-compressed in chunks
+when the client accepts it, instead of being serialized as one big
+string.
+"""
+import hashlib
+import json
+import zlib
+from typing import Dict, Iterator, Mapping
+
+from flask import Flask, Response, abort, request
+
+HyperServer = __import__('2-hypermedia_pagination').Server
+IndexServer = __import__('3-hypermedia_del_pagination').Server
+FILTER_COLUMNS = __import__('secondary_index').FILTER_COLUMNS
+
+STREAM_MIN_ROWS = 1000
+CHUNK_SIZE = 1 << 16
+
+app = Flask(__name__)
+hyper_server = HyperServer()
+index_server = IndexServer()
+
+
+def int_arg(name: str, default: int) -> int:
+    """
+    Reads an integer query parameter, answering 400 if it is malformed.
+    """
+    try:
+        return int(request.args.get(name, default))
+    except ValueError:
+        abort(400)
+
+
+def make_etag(endpoint: str, identity, version, params: Mapping,
+              coding: str) -> str:
+    """
+    Strong ETag of a page: a digest of the endpoint, dataset identity
+    and version, (order-independent) request parameters and content
+    coding, since a gzip body and an identity body differ byte-wise.
+    """
+    key = json.dumps([endpoint, identity, version,
+                      sorted(params.items()), coding], default=str)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def json_chunks(page: Dict) -> Iterator[bytes]:
+    """
+    Encodes `page` as JSON in chunks of about `CHUNK_SIZE` bytes.
+    """
+    buffer = []
+    size = 0
+    for part in json.JSONEncoder().iterencode(page):
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Compresses a stream of chunks into one gzip member, chunk by chunk.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def page_response(endpoint: str, server, params: Mapping,
+                  build) -> Response:
+    """
+    Answers 304 if the client holds the current ETag of the page,
+    otherwise the JSON of `build()`, streamed if it is large. No ETag
+    is sent while the identity of the loaded file is unknown.
+    """
+    streamed = params["page_size"] >= STREAM_MIN_ROWS
+    coding = "identity"
+    if streamed and "gzip" in request.accept_encodings:
+        coding = "gzip"
+    identity = server.dataset_identity()
+    etag = None
+    if identity is not None:
+        etag = make_etag(endpoint, identity, server.dataset_version(),
+                         params, coding)
+    if etag is not None and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    try:
+        page = build()
+    except (AssertionError, ValueError):
+        abort(400)
+    except IndexError:
+        abort(404)
+    headers = {"Vary": "Accept-Encoding"}
+    if not streamed:
+        response = Response(json.dumps(page), headers=headers,
+                            mimetype="application/json")
+    else:
+        chunks = json_chunks(page)
+        if coding == "gzip":
+            chunks = gzip_chunks(chunks)
+            headers["Content-Encoding"] = "gzip"
+        response = Response(chunks, headers=headers,
+                            mimetype="application/json")
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+@app.route('/pages', strict_slashes=False)
+def pages() -> Response:
+    """
+    `get_hyper` of `page` and `page_size`, optionally filtered by year,
+    gender, ethnicity and name and ordered by `sort`.
+    """
+    page = int_arg("page", 1)
+    page_size = int_arg("page_size", 10)
+    filters = {column: request.args[column]
+               for column in FILTER_COLUMNS if column in request.args}
+    sort = request.args.get("sort")
+    params = dict(filters, page=page, page_size=page_size, sort=sort)
+    return page_response(
+        "pages", hyper_server, params,
+        lambda: hyper_server.get_hyper(page, page_size, filters, sort))
+
+
+@app.route('/indexes', strict_slashes=False)
+def indexes() -> Response:
+    """
+    `get_hyper_index` of `index` and `page_size`, optionally ordered by
+    `sort`.
+    """
+    index = int_arg("index", 0)
+    page_size = int_arg("page_size", 10)
+    sort = request.args.get("sort")
+    params = {"index": index, "page_size": page_size, "sort": sort}
+    return page_response(
+        "indexes", index_server, params,
+        lambda: index_server.get_hyper_index(index, page_size, sort))
+
+
+if __name__ == "__main__":
+    app.run(port="5000", host="0.0.0.0")
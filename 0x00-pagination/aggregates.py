@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Precomputed Count totals of every name per Year, Gender and Ethnicity.
+
+Totals are kept for each (year, gender, ethnicity) group, so a top-N
+query only adds up the few groups matching its filters instead of
+grouping every row. They are built in a single pass, over the encoded
+columns when the dataset is columnar, and kept up to date as rows are
+appended or deleted; ranked results are cached per filter until a row
+of a matching group changes.
+"""
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Mapping, Sequence, Tuple
+
+from secondary_index import normalize, query_key
+
+GROUP_COLUMNS = ("year", "gender", "ethnicity")
+
+
+class NameAggregates:
+    """
+    Name totals of Count grouped by Year, Gender and Ethnicity.
+
+    Names are grouped case-insensitively and reported with the spelling
+    first seen. Safe to share between threads.
+    """
+    MAX_CACHED_QUERIES = 128
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, dataset: Sequence = (), size: int = None):
+        """
+        Adds up the first `size` rows of `dataset`, by default all.
+        """
+        self.__groups = {}
+        self.__labels = {}
+        self.__queries = OrderedDict()
+        self.__lock = threading.Lock()
+        size = len(dataset) if size is None else size
+        if hasattr(dataset, "column"):
+            self.__add_columns(dataset, size)
+        else:
+            for start in range(0, size, self.CHUNK_SIZE):
+                self.extend(dataset[start:min(start + self.CHUNK_SIZE,
+                                              size)])
+
+    def __add_columns(self, dataset, size: int) -> None:
+        """
+        Adds up the encoded columns of a ColumnarDataset, decoding each
+        distinct (year, gender, ethnicity, name) combination only once.
+        """
+        totals = {}
+        columns = [dataset.column(name)
+                   for name in ("year", "gender", "ethnicity", "name")]
+        counts = dataset.column("count")
+        for i, key in enumerate(zip(*columns)):
+            if i == size:
+                break
+            totals[key] = totals.get(key, 0) + counts[i]
+        genders = dataset.table("gender")
+        ethnicities = dataset.table("ethnicity")
+        names = dataset.table("name")
+        for (year, gender, ethnicity, name), total in totals.items():
+            self.__add(str(year), genders[gender], ethnicities[ethnicity],
+                       names[name], total)
+
+    def __add(self, year: str, gender: str, ethnicity: str, name: str,
+              count: int) -> Tuple[str, str, str]:
+        """
+        Adds `count` to the total of `name` in its group; a total that
+        drops to zero is removed. Returns the group.
+        """
+        group = (normalize(year), normalize(gender), normalize(ethnicity))
+        key = normalize(name)
+        self.__labels.setdefault(key, name.strip())
+        totals = self.__groups.setdefault(group, {})
+        total = totals.get(key, 0) + count
+        if total:
+            totals[key] = total
+        else:
+            totals.pop(key, None)
+        return group
+
+    def __invalidate(self, groups: Iterable[Tuple[str, str, str]]) -> None:
+        """
+        Drops the cached rankings that include any of `groups`.
+        """
+        for key in list(self.__queries):
+            if any(self.__selects(key, group) for group in groups):
+                del self.__queries[key]
+
+    @staticmethod
+    def __selects(key: Tuple, group: Tuple[str, str, str]) -> bool:
+        """
+        Tells whether the filters of query `key` select `group`.
+        """
+        return all(group[GROUP_COLUMNS.index(column)] == value
+                   for column, value in key)
+
+    def extend(self, rows: Iterable[List]) -> None:
+        """
+        Adds the counts of appended `rows`.
+        """
+        changed = set()
+        with self.__lock:
+            for year, gender, ethnicity, name, count, _ in rows:
+                changed.add(self.__add(year, gender, ethnicity, name,
+                                       int(count)))
+            self.__invalidate(changed)
+
+    def remove(self, rows: Iterable[List]) -> None:
+        """
+        Subtracts the counts of deleted `rows`.
+        """
+        changed = set()
+        with self.__lock:
+            for year, gender, ethnicity, name, count, _ in rows:
+                changed.add(self.__add(year, gender, ethnicity, name,
+                                       -int(count)))
+            self.__invalidate(changed)
+
+    def top(self, filters: Mapping = None) -> List[List[str]]:
+        """
+        Returns [name, total, rank] for every name in the groups matching
+        `filters` (on year, gender and ethnicity), highest total first.
+        Equal totals share a rank and are listed by name.
+        """
+        filters = filters or {}
+        for column in filters:
+            if column not in GROUP_COLUMNS:
+                raise ValueError("Unknown group column: {}".format(column))
+        key = query_key(filters)
+        with self.__lock:
+            cached = self.__queries.get(key)
+            if cached is not None:
+                self.__queries.move_to_end(key)
+                return cached
+            totals = {}
+            for group, names in self.__groups.items():
+                if self.__selects(key, group):
+                    for name, total in names.items():
+                        totals[name] = totals.get(name, 0) + total
+            ranking = []
+            previous, rank = None, 0
+            for i, (name, total) in enumerate(sorted(
+                    totals.items(), key=lambda item: (-item[1], item[0]))):
+                if total != previous:
+                    previous, rank = total, i + 1
+                ranking.append([self.__labels[name], str(total), str(rank)])
+            self.__queries[key] = ranking
+            if len(self.__queries) > self.MAX_CACHED_QUERIES:
+                self.__queries.popitem(last=False)
+            return ranking
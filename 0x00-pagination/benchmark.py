@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the pagination servers on synthetic datasets.
+
+Baby-name-shaped CSV files of the requested sizes are generated
+(reproducibly, from a seed) and cached in a data directory. Every
+(size, deletion density, server) case then runs in a fresh interpreter,
+so its peak RSS is its own, and reports the dataset load time and the
+latency percentiles of `index_range`, `get_page`, `get_hyper` and
+`get_hyper_index`. Results are written as JSON, tagged with the current
+commit, so runs can be compared across commits:
+
+    ./benchmark.py --sizes 10000 100000 --deletions 0 0.5 -o run.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+SERVERS = ("simple", "hyper", "deletion")
+BACKENDS = ("list", "columnar", "mmap")
+YEARS = range(2011, 2017)
+GENDERS = ("FEMALE", "MALE")
+ETHNICITIES = ("ASIAN AND PACIFIC ISLANDER", "BLACK NON HISPANIC",
+               "HISPANIC", "WHITE NON HISPANIC")
+HEADER = ["Year of Birth", "Gender", "Ethnicity", "Child's First Name",
+          "Count", "Rank"]
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "Popular_Baby_Names.csv")
+
+
+def name_pool(seed: int) -> List[str]:
+    """
+    Returns the distinct names of the bundled CSV, or made-up ones if it
+    is missing.
+    """
+    if os.path.exists(SAMPLE_FILE):
+        with open(SAMPLE_FILE) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            return sorted({row[3] for row in reader})
+    rng = random.Random(seed)
+    syllables = ["li", "an", "ma", "ra", "el", "jo", "sa", "mi", "ka", "on"]
+    return sorted({"".join(rng.choice(syllables)
+                           for _ in range(rng.randint(2, 4))).title()
+                   for _ in range(2000)})
+
+
+def generate_csv(path: str, rows: int, seed: int = 0) -> str:
+    """
+    Writes `rows` random baby-name rows to `path` unless it exists.
+    """
+    if os.path.exists(path):
+        return path
+    rng = random.Random(seed)
+    names = name_pool(seed)
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(HEADER)
+        for start in range(0, rows, 10000):
+            writer.writerows(
+                [rng.choice(YEARS), rng.choice(GENDERS),
+                 rng.choice(ETHNICITIES), rng.choice(names),
+                 rng.randint(10, 300), rng.randint(1, 100)]
+                for _ in range(min(10000, rows - start)))
+    os.replace(tmp, path)
+    return path
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarizes latencies in seconds as microsecond percentiles.
+    """
+    samples = sorted(samples)
+
+    def at(q: float) -> float:
+        return round(samples[min(len(samples) - 1,
+                                 int(q * len(samples)))] * 1e6, 2)
+    return {"calls": len(samples), "p50_us": at(0.50), "p90_us": at(0.90),
+            "p99_us": at(0.99), "max_us": at(1.0)}
+
+
+def measure(call: Callable[[int], object], calls: int) -> Dict[str, float]:
+    """
+    Times `calls` invocations of `call(i)`.
+    """
+    samples = []
+    clock = time.perf_counter
+    for i in range(calls):
+        start = clock()
+        call(i)
+        samples.append(clock() - start)
+    return percentiles(samples)
+
+
+def load_backend(name: str):
+    """
+    Returns the Server backend called `name`.
+    """
+    if name == "columnar":
+        return __import__("dataset_backends").ColumnarDataset.from_csv
+    if name == "mmap":
+        return __import__("dataset_backends").MmapDataset
+    return None
+
+
+def run_case(server: str, path: str, backend: str, deletions: float,
+             calls: int, page_size: int, seed: int) -> Dict:
+    """
+    Benchmarks one server on `path`; meant to run in its own process.
+    """
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    module = {"simple": "1-simple_pagination",
+              "hyper": "2-hypermedia_pagination",
+              "deletion": "3-hypermedia_del_pagination"}[server]
+    base = __import__(module).Server
+    server_class = type("Server", (base,), {"DATA_FILE": path})
+    kwargs = {}
+    if backend != "list":
+        kwargs["backend"] = load_backend(backend)
+    instance = server_class(**kwargs)
+    rng = random.Random(seed)
+    result = {}
+
+    start = time.perf_counter()
+    if server == "deletion":
+        # The view is lazy: `current()` loads the CSV and tombstones.
+        instance.indexed_dataset().current()
+    else:
+        instance.dataset()
+    result["load_s"] = round(time.perf_counter() - start, 4)
+    size = len(instance.dataset())
+    pages = max(1, size // page_size)
+    page_args = [rng.randint(1, pages) for _ in range(calls)]
+
+    index_range = __import__("0-simple_helper_function").index_range
+    result["index_range"] = measure(
+        lambda i: index_range(page_args[i], page_size), calls)
+    if server != "deletion":
+        result["get_page"] = measure(
+            lambda i: instance.get_page(page_args[i], page_size), calls)
+    if server == "hyper":
+        result["get_hyper"] = measure(
+            lambda i: instance.get_hyper(page_args[i], page_size), calls)
+    if server == "deletion":
+        dead = rng.sample(range(size), int(size * deletions))
+        start = time.perf_counter()
+        instance.delete_many(dead)
+        result["delete_s"] = round(time.perf_counter() - start, 4)
+        live = instance.indexed_dataset().tombstones
+        indexes = [live.select(rng.randrange(live.live_count()))
+                   if live.live_count() else 0 for _ in range(calls)]
+        result["get_hyper_index"] = measure(
+            lambda i: instance.get_hyper_index(indexes[i], page_size),
+            calls)
+    result["peak_rss_kb"] = resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def commit() -> str:
+    """
+    Returns the current git commit, if any.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main(argv: List[str] = None) -> Dict:
+    """
+    Runs every benchmark case and writes the JSON report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10 ** 4, 10 ** 5, 10 ** 6],
+                        help="dataset sizes in rows (up to 10^7)")
+    parser.add_argument("--deletions", type=float, nargs="+", default=[0.0],
+                        help="fractions of rows deleted before paging")
+    parser.add_argument("--servers", nargs="+", choices=SERVERS,
+                        default=list(SERVERS))
+    parser.add_argument("--backend", choices=BACKENDS, default="list")
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="benchmark-data")
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(**json.loads(args.case))))
+        return {}
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "calls": args.calls,
+        "page_size": args.page_size,
+        "seed": args.seed,
+        "results": [],
+    }
+    for size in args.sizes:
+        path = generate_csv(os.path.join(
+            args.data_dir, "names-{}-{}.csv".format(size, args.seed)),
+            size, args.seed)
+        for deletions in args.deletions:
+            for server in args.servers:
+                if deletions and server != "deletion":
+                    continue
+                case = {"server": server, "path": os.path.abspath(path),
+                        "backend": args.backend, "deletions": deletions,
+                        "calls": args.calls, "page_size": args.page_size,
+                        "seed": args.seed}
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__),
+                     "--case", json.dumps(case)],
+                    capture_output=True, text=True, check=True).stdout
+                result = dict(json.loads(output), server=server,
+                              rows=size, deletions=deletions)
+                report["results"].append(result)
+                print(json.dumps(result), file=sys.stderr)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
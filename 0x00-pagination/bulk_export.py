@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Streaming encoders for bulk exports of the dataset.
+
+Rows arrive in chunks from a generator and each chunk is encoded and
+yielded before the next one is read, so a slow consumer holds back the
+export instead of the server buffering every row.
+"""
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List, Sequence
+
+FORMATS = ("ndjson", "csv")
+
+
+def read_header(path: str) -> List[str]:
+    """
+    Returns the header row of the CSV file at `path`.
+    """
+    with open(path) as f:
+        return next(csv.reader(f), [])
+
+
+def encode(rows: Iterable[Sequence[str]], fmt: str) -> str:
+    """
+    Encodes `rows` as NDJSON (one JSON array per line) or as CSV lines.
+    """
+    if fmt == "ndjson":
+        return "".join(json.dumps(row) + "\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+def stream(chunks: Iterable[List[Sequence[str]]], fmt: str = "ndjson",
+           header: Sequence[str] = None) -> Iterator[str]:
+    """
+    Yields the encoding of every chunk of rows, preceded by `header`
+    for CSV. Raises ValueError for an unknown format.
+    """
+    if fmt not in FORMATS:
+        raise ValueError("Unknown export format: {}".format(fmt))
+    if fmt == "csv" and header:
+        yield encode([header], fmt)
+    for rows in chunks:
+        if rows:
+            yield encode(rows, fmt)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tail-following reads of a CSV file that grows by appended rows.
+"""
+import csv
+import io
+import os
+from typing import List, Optional, Tuple
+
+
+class CsvTail:
+    """
+    Tracks how far a CSV file has been loaded, so later reads parse only
+    the bytes appended since.
+
+    Create it right before loading the file and call `mark` right after:
+    if the file changed in between, the loaded offset is unknown and the
+    next read asks for a full reload rather than risking duplicate rows.
+    Appenders are expected to write whole, newline-terminated rows; a
+    trailing partial line is left for a later read.
+
+    `identity` names the loaded content across processes: the inode,
+    the loaded size and the modification time of the file, or None
+    while the loaded offset is unknown.
+    """
+    FINGERPRINT_SIZE = 64
+
+    def __init__(self, path: str):
+        """
+        Starts tracking `path`, remembering its state before the load.
+        """
+        self.path = path
+        self.offset = None
+        self.identity: Optional[Tuple[int, int, int]] = None
+        self.__before = os.stat(path)
+        self.__inode = None
+        self.__fingerprint = b""
+
+    def __read(self, start: int, end: int) -> bytes:
+        """
+        Returns bytes `start` to `end` of the file.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def mark(self, offset: int = None) -> None:
+        """
+        Records that the file was loaded up to `offset`, by default its
+        size when the tail was created, provided it did not change since:
+        a given `offset` was checked against the file while it loaded.
+        """
+        after = os.stat(self.path)
+        before = self.__before
+        if (before.st_ino, before.st_size, before.st_mtime_ns) != (
+                after.st_ino, after.st_size, after.st_mtime_ns):
+            return
+        if offset is None:
+            offset = after.st_size
+        if offset > after.st_size:
+            return
+        self.offset = offset
+        self.identity = (after.st_ino, offset, after.st_mtime_ns)
+        self.__inode = after.st_ino
+        self.__fingerprint = self.__read(
+            max(0, offset - self.FINGERPRINT_SIZE), offset)
+
+    def read_appended(self) -> Optional[List[List[str]]]:
+        """
+        Parses the complete rows appended since the last read; returns
+        an empty list if there are none, or None if the file was
+        truncated or rewritten and has to be reloaded from scratch.
+        """
+        if self.offset is None:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        if stat.st_ino != self.__inode or stat.st_size < self.offset:
+            return None
+        start = self.offset - len(self.__fingerprint)
+        if self.__read(start, self.offset) != self.__fingerprint:
+            return None
+        data = self.__read(self.offset, stat.st_size)
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return []
+        data = data[:end]
+        self.offset += end
+        self.identity = (stat.st_ino, self.offset, stat.st_mtime_ns)
+        self.__fingerprint = (self.__fingerprint + data)[
+            -self.FINGERPRINT_SIZE:]
+        text = data.decode("utf-8")
+        return list(csv.reader(io.StringIO(text, newline=None)))
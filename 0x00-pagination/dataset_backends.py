@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Alternative dataset backends for the pagination servers.
+
+A backend is any callable that takes the path of the CSV file and
+returns a sequence of rows, so it can be passed to `Server(backend=...)`
+in place of the default in-memory list built with `csv.reader`.
+"""
+import csv
+import functools
+import io
+import mmap
+import os
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+COLUMNS = ("year", "gender", "ethnicity", "name", "count", "rank")
+CATEGORICAL = ("gender", "ethnicity", "name")
+TYPECODES = {
+    "year": "i",
+    "gender": "H",
+    "ethnicity": "H",
+    "name": "I",
+    "count": "i",
+    "rank": "i",
+}
+
+
+class StaleFileError(OSError):
+    """
+    Raised when the file behind a MmapDataset shrank since it was mapped,
+    instead of faulting on the missing pages; the dataset must be
+    reloaded.
+    """
+
+
+def reload_on_stale(method: Callable) -> Callable:
+    """
+    Decorates a server method so that a StaleFileError reloads the
+    server's dataset and runs the method once more.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except StaleFileError:
+            self.reload()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class MmapDataset(Sequence):
+    """
+    Read-only, memory-mapped view of a CSV file.
+
+    Only a compact table of row-start byte offsets is kept in memory;
+    rows are decoded and parsed when they are indexed or sliced, so a
+    page of `page_size` rows costs `page_size` row parses no matter how
+    large the file is. Rows must not contain quoted line breaks.
+
+    The file may only grow by appended rows while it is mapped. Writers
+    replacing it must write a temporary file and `os.replace` it, which
+    leaves the mapped file intact: reading a mapped page past the end of
+    a file truncated in place kills the process with SIGBUS. Every read
+    checks the file size first and raises StaleFileError if it shrank,
+    but a truncation racing a read cannot be caught.
+    """
+
+    def __init__(self, path: str, encoding: str = "utf-8",
+                 header: bool = True):
+        """
+        Maps `path` into memory and indexes its row boundaries.
+        """
+        self.path = path
+        self.encoding = encoding
+        self.__file = open(path, "rb")
+        self.__size = os.fstat(self.__file.fileno()).st_size
+        self.__map = None
+        if self.__size > 0:
+            self.__map = mmap.mmap(self.__file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        self.__offsets = self.__index_rows(header)
+
+    def __index_rows(self, header: bool) -> array:
+        """
+        Builds the row-start offsets, plus a trailing end-of-file offset.
+        """
+        offsets = array("Q")
+        pos = 0
+        if self.__map is not None:
+            if header:
+                pos = self.__next_line(0)
+            while pos < self.__size:
+                offsets.append(pos)
+                pos = self.__next_line(pos)
+        offsets.append(self.__size)
+        return offsets
+
+    def __next_line(self, pos: int) -> int:
+        """
+        Returns the offset of the line following the one at `pos`.
+        """
+        newline = self.__map.find(b"\n", pos)
+        if newline == -1:
+            return self.__size
+        return newline + 1
+
+    def __parse(self, start: int, end: int) -> List[List]:
+        """
+        Parses the contiguous rows `start` to `end` (exclusive).
+        """
+        if start >= end:
+            return []
+        first, last = self.__offsets[start], self.__offsets[end]
+        mapped, size = self.__map, self.__size
+        if os.fstat(self.__file.fileno()).st_size < size:
+            raise StaleFileError("{} was truncated or rewritten in place"
+                                 .format(self.path))
+        raw = mapped[first:last]
+        text = raw.decode(self.encoding)
+        return list(csv.reader(io.StringIO(text, newline=None)))
+
+    def __len__(self) -> int:
+        return len(self.__offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return self.__parse(start, max(start, stop))
+            return [self.__parse(i, i + 1)[0]
+                    for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Index out of range")
+        return self.__parse(index, index + 1)[0]
+
+    def extend(self, rows: List[List]) -> None:
+        """
+        Indexes the next `len(rows)` lines appended to the file since it
+        was mapped; the rows themselves are parsed from the map on access.
+        Readers take no lock, so the new map is swapped in before the new
+        offsets are published, and the old map is closed by the garbage
+        collector once no reader holds it, rather than under their feet.
+        """
+        mapped = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__map = mapped
+        self.__size = len(mapped)
+        pos = self.__offsets[-1]
+        for _ in range(len(rows)):
+            pos = self.__next_line(pos)
+            self.__offsets.append(pos)
+
+    def close(self) -> None:
+        """
+        Releases the memory map and the underlying file.
+        """
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        self.__file.close()
+
+
+class ColumnarDataset(Sequence):
+    """
+    Column-oriented, dictionary-encoded copy of the baby names dataset.
+
+    Year, Count and Rank are stored as typed integer arrays; Gender,
+    Ethnicity and the (interned) first names are stored once in lookup
+    tables and referenced by small integer codes. Rows are rebuilt as
+    lists of strings only when they are indexed or sliced, so pages keep
+    the same shape as the csv.reader rows.
+    """
+
+    def __init__(self, columns: Dict[str, Sequence],
+                 tables: Dict[str, List[str]]):
+        """
+        Wraps already-encoded `columns` and their code lookup `tables`.
+        """
+        self.__columns = columns
+        self.__tables = tables
+        self.__codes = {
+            name: {value: code for code, value in enumerate(tables[name])}
+            for name in CATEGORICAL
+        }
+
+    @classmethod
+    def empty(cls) -> "ColumnarDataset":
+        """
+        Creates a dataset with no rows, ready to be extended.
+        """
+        columns = {name: array(TYPECODES[name]) for name in COLUMNS}
+        return cls(columns, {name: [] for name in CATEGORICAL})
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[List[str]]) -> "ColumnarDataset":
+        """
+        Encodes an iterable of six-field rows.
+        """
+        dataset = cls.empty()
+        dataset.extend(rows)
+        return dataset
+
+    @classmethod
+    def from_csv(cls, path: str) -> "ColumnarDataset":
+        """
+        Loads `path`, skipping its header row; usable as a Server backend.
+        """
+        with open(path) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            return cls.from_rows(reader)
+
+    def __encode(self, name: str, value: str) -> int:
+        """
+        Returns the code of a categorical `value`, assigning a new one.
+        """
+        codes = self.__codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            if name == "name":
+                value = sys.intern(value)
+            codes[value] = code
+            self.__tables[name].append(value)
+        return code
+
+    def export(self) -> Tuple[Dict[str, Sequence], Dict]:
+        """
+        Returns the typed columns and the JSON-serializable lookup tables.
+        """
+        return dict(self.__columns), {"tables": self.__tables}
+
+    def extend(self, rows: Iterable[List[str]]) -> None:
+        """
+        Appends rows to the end of the dataset.
+        Read-only columns (e.g. mapped from a snapshot) are copied first.
+        The year column, which gives the length, is written last, so
+        concurrent readers never see a partially appended row.
+        """
+        columns = self.__columns
+        for name in COLUMNS:
+            if not isinstance(columns[name], array):
+                columns[name] = array(TYPECODES[name],
+                                      columns[name].tobytes())
+        for row in rows:
+            if len(row) != len(COLUMNS):
+                raise ValueError("Expected {} fields, got {}".format(
+                    len(COLUMNS), len(row)))
+            year, gender, ethnicity, name, count, rank = row
+            year, count, rank = int(year), int(count), int(rank)
+            columns["gender"].append(self.__encode("gender", gender))
+            columns["ethnicity"].append(
+                self.__encode("ethnicity", ethnicity))
+            columns["name"].append(self.__encode("name", name))
+            columns["count"].append(count)
+            columns["rank"].append(rank)
+            columns["year"].append(year)
+
+    def column(self, name: str) -> Sequence:
+        """
+        Returns the raw (possibly encoded) column `name`.
+        """
+        return self.__columns[name]
+
+    def table(self, name: str) -> List[str]:
+        """
+        Returns the code lookup table of the categorical column `name`.
+        """
+        return self.__tables[name]
+
+    def row(self, index: int) -> List[str]:
+        """
+        Materializes the row at a non-negative `index`.
+        """
+        columns = self.__columns
+        tables = self.__tables
+        return [
+            str(columns["year"][index]),
+            tables["gender"][columns["gender"][index]],
+            tables["ethnicity"][columns["ethnicity"][index]],
+            tables["name"][columns["name"][index]],
+            str(columns["count"][index]),
+            str(columns["rank"][index]),
+        ]
+
+    def __len__(self) -> int:
+        return len(self.__columns["year"])
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Index out of range")
+        return self.row(index)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Tombstone bookkeeping for deletion-resilient pagination.
+
+Deleted rows keep their position; a bitmap marks them as tombstones and
+a Fenwick tree over per-block live counts answers rank/select queries,
+so finding the next live rows after any index costs O(log n) per jump
+over a deleted range instead of one probe per deleted row.
+"""
+import hashlib
+from array import array
+from collections.abc import MutableMapping
+from typing import (Callable, Dict, Hashable, Iterable, Iterator, List,
+                    Optional, Sequence, Tuple)
+
+
+class FenwickTree:
+    """
+    Binary indexed tree over non-negative integer counts.
+    """
+
+    def __init__(self, values: Iterable[int] = ()):
+        """
+        Builds the tree from `values` in linear time.
+        """
+        tree = array("q", [0])
+        tree.extend(values)
+        size = len(tree) - 1
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.__tree = tree
+
+    def __len__(self) -> int:
+        return len(self.__tree) - 1
+
+    def add(self, index: int, delta: int) -> None:
+        """
+        Adds `delta` to the count at 0-based `index`.
+        """
+        tree = self.__tree
+        i = index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, end: int) -> int:
+        """
+        Returns the sum of the counts before 0-based `end`.
+        """
+        tree = self.__tree
+        total = 0
+        i = end
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def select(self, k: int) -> int:
+        """
+        Returns the smallest 0-based index whose prefix sum reaches `k`.
+        `k` must be between 1 and the total of all counts.
+        """
+        tree = self.__tree
+        size = len(tree) - 1
+        pos = 0
+        step = 1 << size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= size and tree[nxt] < k:
+                pos = nxt
+                k -= tree[nxt]
+            step >>= 1
+        return pos
+
+    def copy(self) -> "FenwickTree":
+        """
+        Returns an independent copy of the tree.
+        """
+        clone = FenwickTree()
+        clone.__tree = array("q", self.__tree)
+        return clone
+
+
+def position_digest(pos: int) -> int:
+    """
+    128-bit hash of a row position, the same in every process.
+    """
+    digest = hashlib.blake2b(pos.to_bytes(8, "little"), digest_size=16)
+    return int.from_bytes(digest.digest(), "little")
+
+
+class TombstoneIndex:
+    """
+    Live/deleted state of `size` row positions.
+
+    Positions are grouped in blocks of `block_size`; each block keeps a
+    bitmap of its tombstones (as a Python int, bit set means deleted)
+    and the Fenwick tree holds the live count of every block.
+    `version` counts the successful deletions, while `digest`, the XOR
+    of the `position_digest` of every deleted position, names the set of
+    tombstones: it is equal for equal sets, whatever the order of the
+    deletions or the process that made them.
+    """
+
+    def __init__(self, size: int, block_size: int = 1024):
+        """
+        Starts with every position in `range(size)` live.
+        """
+        self.size = size
+        self.block_size = block_size
+        blocks = -(-size // block_size)
+        self.__dead = [0] * blocks
+        self.__tree = FenwickTree(
+            min(block_size, size - b * block_size) for b in range(blocks))
+        self.__live = size
+        self.version = 0
+        self.digest = 0
+
+    def __block_mask(self, block: int) -> int:
+        """
+        Returns a mask with one bit per position of `block`.
+        """
+        width = min(self.block_size, self.size - block * self.block_size)
+        return (1 << width) - 1
+
+    def __first_live(self, block: int, offset: int) -> Optional[int]:
+        """
+        Returns the first live position of `block` at or after `offset`.
+        """
+        live = (~self.__dead[block] & self.__block_mask(block)) >> offset
+        if not live:
+            return None
+        return (block * self.block_size + offset +
+                (live & -live).bit_length() - 1)
+
+    def live_count(self) -> int:
+        """
+        Number of positions that have not been deleted.
+        """
+        return self.__live
+
+    def is_live(self, pos: int) -> bool:
+        """
+        Tells whether `pos` is a valid, non-deleted position.
+        """
+        if not 0 <= pos < self.size:
+            return False
+        block, offset = divmod(pos, self.block_size)
+        return not self.__dead[block] >> offset & 1
+
+    def delete(self, pos: int) -> bool:
+        """
+        Marks `pos` as deleted; returns False if it was not live.
+        """
+        if not self.is_live(pos):
+            return False
+        block, offset = divmod(pos, self.block_size)
+        self.__dead[block] |= 1 << offset
+        self.__tree.add(block, -1)
+        self.__live -= 1
+        self.version += 1
+        self.digest ^= position_digest(pos)
+        return True
+
+    def rank(self, pos: int) -> int:
+        """
+        Returns how many live positions come before `pos`.
+        """
+        pos = max(0, min(pos, self.size))
+        block, offset = divmod(pos, self.block_size)
+        if block >= len(self.__dead):
+            return self.__live
+        before = ~self.__dead[block] & ((1 << offset) - 1)
+        return self.__tree.prefix(block) + bin(before).count("1")
+
+    def select(self, k: int) -> Optional[int]:
+        """
+        Returns the position of the `k`-th (0-based) live row, if any.
+        """
+        if not 0 <= k < self.__live:
+            return None
+        block = self.__tree.select(k + 1)
+        pos = self.__first_live(block, 0)
+        for _ in range(k - self.__tree.prefix(block)):
+            pos = self.__first_live(block, pos - block * self.block_size + 1)
+        return pos
+
+    def next_live(self, pos: int) -> Optional[int]:
+        """
+        Returns the first live position at or after `pos`, if any.
+        """
+        if pos >= self.size:
+            return None
+        pos = max(pos, 0)
+        block, offset = divmod(pos, self.block_size)
+        found = self.__first_live(block, offset)
+        if found is not None:
+            return found
+        seen = self.__tree.prefix(block + 1)
+        if seen >= self.__live:
+            return None
+        return self.__first_live(self.__tree.select(seen + 1), 0)
+
+    def deleted(self) -> Iterator[int]:
+        """
+        Yields the deleted positions in increasing order.
+        """
+        for block, dead in enumerate(self.__dead):
+            while dead:
+                low = dead & -dead
+                yield block * self.block_size + low.bit_length() - 1
+                dead ^= low
+
+    def live_range(self, pos: int, count: int) -> List[int]:
+        """
+        Returns up to `count` live positions starting from `pos`.
+        """
+        positions = []
+        found = self.next_live(pos)
+        while found is not None and len(positions) < count:
+            positions.append(found)
+            found = self.next_live(found + 1)
+        return positions
+
+    def extend(self, count: int) -> None:
+        """
+        Appends `count` live positions after the existing ones.
+        """
+        self.size += count
+        blocks = -(-self.size // self.block_size)
+        self.__dead.extend([0] * (blocks - len(self.__dead)))
+        self.__tree = FenwickTree(
+            bin(self.__block_mask(b) & ~dead).count("1")
+            for b, dead in enumerate(self.__dead))
+        self.__live += count
+
+    def copy(self) -> "TombstoneIndex":
+        """
+        Returns an independent copy sharing no mutable state.
+        """
+        clone = TombstoneIndex(0, self.block_size)
+        clone.size = self.size
+        clone.__dead = list(self.__dead)
+        clone.__tree = self.__tree.copy()
+        clone.__live = self.__live
+        clone.version = self.version
+        clone.digest = self.digest
+        return clone
+
+
+class IndexedDataset(MutableMapping):
+    """
+    Dataset positions mapped to rows, where deleting a key leaves a
+    tombstone instead of shifting the positions that follow it.
+
+    `orders` holds the same tombstones laid out in sorted orders of the
+    rows, keyed by sort, with the inverse permutation giving the sorted
+    rank of each position; deletions keep them in step.
+    """
+
+    def __init__(self, dataset: Sequence, tombstones: TombstoneIndex = None,
+                 generation: int = 0,
+                 orders: Dict[Hashable, Tuple[Sequence[int],
+                                              TombstoneIndex]] = None):
+        """
+        Indexes every row of `dataset` by its position, starting at 0.
+        `generation` identifies the load of `dataset` this view belongs to.
+        """
+        self.dataset = dataset
+        if tombstones is None:
+            tombstones = TombstoneIndex(len(dataset))
+        self.tombstones = tombstones
+        self.generation = generation
+        self.orders = {} if orders is None else orders
+
+    def ordered(self, sort: Hashable,
+                inverse: Sequence[int]) -> TombstoneIndex:
+        """
+        Returns the tombstones at the sorted ranks given by `inverse`,
+        derived from the deleted positions on first use.
+        """
+        entry = self.orders.get(sort)
+        if entry is None:
+            tombstones = TombstoneIndex(self.tombstones.size,
+                                        self.tombstones.block_size)
+            for pos in self.tombstones.deleted():
+                tombstones.delete(inverse[pos])
+            entry = self.orders.setdefault(sort, (inverse, tombstones))
+        return entry[1]
+
+    def copy(self) -> "IndexedDataset":
+        """
+        Returns a view of the same rows with independent tombstones.
+        """
+        orders = {sort: (inverse, tombstones.copy())
+                  for sort, (inverse, tombstones)
+                  in list(self.orders.items())}
+        return IndexedDataset(self.dataset, self.tombstones.copy(),
+                              self.generation, orders)
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        """
+        The generation and the number of deletions applied to it.
+        """
+        return (self.generation, self.tombstones.version)
+
+    def __getitem__(self, index: int) -> List:
+        if not self.tombstones.is_live(index):
+            raise KeyError(index)
+        return self.dataset[index]
+
+    def __setitem__(self, index: int, row: List) -> None:
+        raise TypeError("Rows can only be deleted, not assigned")
+
+    def __delitem__(self, index: int) -> None:
+        if not self.tombstones.delete(index):
+            raise KeyError(index)
+        for inverse, tombstones in self.orders.values():
+            tombstones.delete(inverse[index])
+
+    def __iter__(self) -> Iterator[int]:
+        pos = self.tombstones.next_live(0)
+        while pos is not None:
+            yield pos
+            pos = self.tombstones.next_live(pos + 1)
+
+    def __len__(self) -> int:
+        return self.tombstones.live_count()
+
+
+class DatasetView(MutableMapping):
+    """
+    Live mapping over the current version of an indexed dataset.
+
+    Reads go to whichever IndexedDataset `current()` returns, and
+    deleting a key calls `delete(key)`, which publishes a new version
+    instead of modifying the one that readers or cursors may hold.
+    Other attributes (`tombstones`, `dataset`, `version`...) are those
+    of the current version; call `current()` once to read several of
+    them from the same version.
+    """
+
+    def __init__(self, current: Callable[[], IndexedDataset],
+                 delete: Callable[[int], None]):
+        """
+        Wraps the `current` version getter and the `delete` writer.
+        """
+        self.current = current
+        self.__delete = delete
+
+    def __getattr__(self, name: str):
+        return getattr(self.current(), name)
+
+    def __getitem__(self, index: int) -> List:
+        return self.current()[index]
+
+    def __setitem__(self, index: int, row: List) -> None:
+        raise TypeError("Rows can only be deleted, not assigned")
+
+    def __delitem__(self, index: int) -> None:
+        self.__delete(index)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.current())
+
+    def __len__(self) -> int:
+        return len(self.current())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Optional counters and latency histograms for the pagination servers.
+
+A server given a metrics sink reports to it through two calls,
+`inc(name, value, **labels)` and `observe(name, seconds, **labels)`, so
+any object with those methods can be plugged in. Without a sink the
+servers only test it against None, which keeps the cost of disabled
+instrumentation close to zero. `MemorySink` keeps everything in memory
+and renders it as a snapshot dict or in the Prometheus text format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005,
+                   0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+@contextmanager
+def timed(sink, name: str, **labels) -> Iterator[None]:
+    """
+    Observes the duration of the block under `name` if `sink` is set.
+    """
+    if sink is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sink.observe(name, time.perf_counter() - start, **labels)
+
+
+def series(name: str, labels: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Returns the Prometheus series name of `name` with `labels`.
+    """
+    if not labels:
+        return name
+    return "{}{{{}}}".format(name, ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\")
+                         .replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels))
+
+
+class MemorySink:
+    """
+    Thread-safe in-memory store of counters and histograms.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Creates an empty sink whose histograms use the upper `buckets`
+        bounds, in seconds.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.__counters = {}
+        self.__histograms = {}
+        self.__lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Adds `value` to the counter `name`.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Records one `value` in the histogram `name`.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                histogram = self.__histograms[key] = [
+                    [0] * len(self.buckets), 0, 0.0]
+            counts = histogram[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            histogram[1] += 1
+            histogram[2] += value
+
+    def reset(self) -> None:
+        """
+        Drops every counter and histogram.
+        """
+        with self.__lock:
+            self.__counters.clear()
+            self.__histograms.clear()
+
+    def snapshot(self) -> Dict:
+        """
+        Returns the counters and the histograms (with cumulative bucket
+        counts, as in Prometheus) keyed by series name.
+        """
+        with self.__lock:
+            counters = dict(self.__counters)
+            histograms = {key: (list(counts), count, total)
+                          for key, (counts, count, total)
+                          in self.__histograms.items()}
+        result = {"counters": {}, "histograms": {}}
+        for (name, labels), value in sorted(counters.items()):
+            result["counters"][series(name, labels)] = value
+        for (name, labels), (counts, count, total) in sorted(
+                histograms.items()):
+            cumulative = 0
+            buckets = {}
+            for bound, hits in zip(self.buckets, counts):
+                cumulative += hits
+                buckets[repr(bound)] = cumulative
+            buckets["+Inf"] = count
+            result["histograms"][series(name, labels)] = {
+                "buckets": buckets, "count": count, "sum": total}
+        return result
+
+    def prometheus(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        with self.__lock:
+            counters = sorted(self.__counters.items())
+            histograms = sorted(
+                (key, (list(counts), count, total))
+                for key, (counts, count, total)
+                in self.__histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append("# TYPE {} counter".format(name))
+            lines.append("{} {}".format(series(name, labels), value))
+        for (name, labels), (counts, count, total) in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append("# TYPE {} histogram".format(name))
+            cumulative = 0
+            for bound, hits in zip(self.buckets, counts):
+                cumulative += hits
+                lines.append("{} {}".format(series(
+                    name + "_bucket", labels + (("le", repr(bound)),)),
+                    cumulative))
+            lines.append("{} {}".format(series(
+                name + "_bucket", labels + (("le", "+Inf"),)), count))
+            lines.append("{} {}".format(series(name + "_sum", labels),
+                                        total))
+            lines.append("{} {}".format(series(name + "_count", labels),
+                                        count))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Snapshot-isolated cursors over copy-on-write dataset versions.
+
+Every deletion publishes a new immutable version of the indexed
+dataset; a cursor pins the version it started on, so a client walking
+`next_index` keeps reading that version while deletions go on. Pinned
+versions are reclaimed once idle for `ttl` seconds, and never more than
+`max_versions` are retained.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class VersionRegistry:
+    """
+    Opaque cursor tokens mapped to the dataset versions they pin.
+    """
+
+    def __init__(self, max_versions: int = 16, ttl: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Retains at most `max_versions` versions, each until it has not
+        been read for `ttl` seconds.
+        """
+        self.max_versions = max_versions
+        self.ttl = ttl
+        self.__clock = clock
+        self.__pinned = OrderedDict()
+        self.__tokens = {}
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__pinned)
+
+    def __drop_oldest(self) -> None:
+        """
+        Releases the least recently read version and its cursor.
+        """
+        _, (version, _, _) = self.__pinned.popitem(last=False)
+        del self.__tokens[version]
+
+    def __reclaim(self, now: float) -> None:
+        """
+        Releases expired versions; they are ordered by last read, so
+        this stops at the first one still alive.
+        """
+        while self.__pinned:
+            expires = next(iter(self.__pinned.values()))[2]
+            if expires > now:
+                break
+            self.__drop_oldest()
+
+    def pin(self, version: Hashable, value: Any) -> str:
+        """
+        Returns the cursor token of `version`, pinning `value` as its
+        content. Cursors started on the same version share one token.
+        """
+        with self.__lock:
+            now = self.__clock()
+            self.__reclaim(now)
+            token = self.__tokens.get(version)
+            if token is None:
+                token = secrets.token_urlsafe(12)
+                self.__tokens[version] = token
+            self.__pinned[token] = (version, value, now + self.ttl)
+            self.__pinned.move_to_end(token)
+            while len(self.__pinned) > self.max_versions:
+                self.__drop_oldest()
+            return token
+
+    def lookup(self, token: str) -> Optional[Any]:
+        """
+        Returns the value pinned by `token`, extending its lifetime, or
+        None if the cursor is unknown or has expired.
+        """
+        with self.__lock:
+            now = self.__clock()
+            self.__reclaim(now)
+            entry = self.__pinned.get(token)
+            if entry is None:
+                return None
+            version, value, _ = entry
+            self.__pinned[token] = (version, value, now + self.ttl)
+            self.__pinned.move_to_end(token)
+            return value
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Wildcard search over the distinct first names of the dataset.
+
+The names of the secondary index are kept sorted, so a prefix such as
+"Oliv*" is a binary-searched range of them, and every name is indexed by
+its trigrams, so a substring such as "*liv*" only checks the names that
+hold all of its trigrams. Matching rows are never scanned: they are the
+posting lists of the matching names, in name order, and a page is
+located in them by binary search over cumulative row counts.
+"""
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import List, Sequence, Tuple
+
+from secondary_index import SecondaryIndex, intersect, normalize
+
+WILDCARD = "*"
+
+
+def trigrams(text: str) -> List[str]:
+    """
+    Returns the distinct three-character substrings of `text`.
+    """
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def matches(name: str, pieces: Sequence[str]) -> bool:
+    """
+    Tells whether `name` matches the pattern split on its wildcards.
+    """
+    if len(pieces) == 1:
+        return name == pieces[0]
+    first, last = pieces[0], pieces[-1]
+    if len(name) < len(first) + len(last):
+        return False
+    if not name.startswith(first) or not name.endswith(last):
+        return False
+    pos = len(first)
+    end = len(name) - len(last)
+    for piece in pieces[1:-1]:
+        pos = name.find(piece, pos, end)
+        if pos < 0:
+            return False
+        pos += len(piece)
+    return True
+
+
+class NameSearch:
+    """
+    Prefix and substring index over the names of a SecondaryIndex.
+
+    Patterns are matched case-insensitively; `*` stands for any run of
+    characters, e.g. "Oliv*", "*liv*", "*a" or "O*a". Without a wildcard
+    the name must match exactly.
+    """
+    MAX_CACHED_QUERIES = 128
+
+    def __init__(self, index: SecondaryIndex):
+        """
+        Indexes the distinct names of `index`.
+        """
+        self.__index = index
+        self.__names = sorted(sys.intern(name)
+                              for name in index.values("name"))
+        grams = {}
+        for code, name in enumerate(self.__names):
+            for gram in trigrams(name):
+                grams.setdefault(gram, array("l")).append(code)
+        self.__trigrams = grams
+        self.__queries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__names)
+
+    def __candidates(self, pieces: Sequence[str]) -> Sequence[int]:
+        """
+        Returns the codes of the names that may match: the range sharing
+        the leading piece, narrowed to the names holding every trigram.
+        """
+        names = self.__names
+        lo, hi = 0, len(names)
+        if pieces[0]:
+            lo = bisect_left(names, pieces[0])
+            hi = bisect_left(names, pieces[0] + chr(sys.maxunicode), lo)
+        lists = [self.__trigrams.get(gram, array("l"))
+                 for piece in pieces[1:] for gram in trigrams(piece)]
+        if not lists:
+            return range(lo, hi)
+        lists.sort(key=len)
+        codes = lists[0]
+        for other in lists[1:]:
+            codes = intersect(codes, other)
+            if not codes:
+                break
+        return codes[bisect_left(codes, lo):bisect_left(codes, hi)]
+
+    def __query(self, pattern: str) -> Tuple[List[str], array]:
+        """
+        Returns the names matching `pattern` in sorted order, and the
+        cumulative count of their rows, starting with 0.
+        """
+        key = normalize(pattern)
+        with self.__lock:
+            cached = self.__queries.get(key)
+            if cached is not None:
+                self.__queries.move_to_end(key)
+                return cached
+        pieces = key.split(WILDCARD)
+        found = [self.__names[code] for code in self.__candidates(pieces)
+                 if matches(self.__names[code], pieces)]
+        counts = array("q", [0])
+        for name in found:
+            counts.append(counts[-1] + len(self.__index.postings("name",
+                                                                 name)))
+        result = (found, counts)
+        with self.__lock:
+            self.__queries[key] = result
+            if len(self.__queries) > self.MAX_CACHED_QUERIES:
+                self.__queries.popitem(last=False)
+        return result
+
+    def names(self, pattern: str) -> List[str]:
+        """
+        Returns the distinct (normalized) names matching `pattern`.
+        """
+        return list(self.__query(pattern)[0])
+
+    def count(self, pattern: str) -> int:
+        """
+        Returns how many rows hold a name matching `pattern`.
+        """
+        return self.__query(pattern)[1][-1]
+
+    def positions(self, pattern: str, start: int, end: int) -> List[int]:
+        """
+        Returns the positions of matching rows `start` to `end`, ordered
+        by name and then by position.
+        """
+        found, counts = self.__query(pattern)
+        end = min(end, counts[-1])
+        result = []
+        i = bisect_right(counts, start) - 1
+        while start < end:
+            postings = self.__index.postings("name", found[i])
+            offset = start - counts[i]
+            taken = postings[offset:offset + end - start]
+            result.extend(taken)
+            start += len(taken)
+            i += 1
+        return result
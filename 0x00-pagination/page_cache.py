@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Bounded, versioned LRU cache of page responses.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+def copy_page(page: Dict) -> Dict:
+    """
+    Copies a page response and its list of rows, so callers changing
+    either never change the cached page.
+    """
+    if "data" not in page:
+        return dict(page)
+    return dict(page, data=list(page["data"]))
+
+
+class PageCache:
+    """
+    Least recently used cache of page responses.
+
+    Every entry is tagged with the dataset version it was built from; a
+    lookup with any other version is a miss and drops the entry, so a
+    page is never served after a deletion or reload changed the data.
+    It is safe to share between threads.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        Creates an empty cache holding at most `maxsize` pages.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable, version) -> Optional[Dict]:
+        """
+        Returns a copy of the page cached under `key` for `version`.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    del self.__entries[key]
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return copy_page(entry[1])
+
+    def put(self, key: Hashable, version, page: Dict) -> None:
+        """
+        Caches `page` under `key`, evicting the least recently used one.
+        """
+        if self.maxsize <= 0:
+            return
+        with self.__lock:
+            self.__entries[key] = (version, copy_page(page))
+            self.__entries.move_to_end(key)
+            if len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drops every cached page; the counters are kept.
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self) -> Dict:
+        """
+        Snapshot of the hit/miss counters and occupancy.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.__entries),
+            "maxsize": self.maxsize,
+        }
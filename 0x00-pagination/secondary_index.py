@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Secondary indexes for filtered pagination.
+
+Every distinct Year, Gender, Ethnicity and Name value gets a sorted
+posting list of the row positions holding it. A filter is answered by
+intersecting the posting lists of its values, starting from the
+shortest one, so its cost follows the size of the matching lists
+rather than the size of the dataset; results are cached per filter.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+FILTER_COLUMNS = {"year": 0, "gender": 1, "ethnicity": 2, "name": 3}
+
+
+def normalize(value) -> str:
+    """
+    Returns the case-insensitive key under which `value` is indexed.
+    """
+    return str(value).strip().casefold()
+
+
+def query_key(filters: Mapping) -> Tuple:
+    """
+    Returns a hashable, order-independent key for `filters`.
+    """
+    return tuple(sorted((column, normalize(value))
+                        for column, value in filters.items()))
+
+
+def row_matches(row: List, key: Tuple) -> bool:
+    """
+    Tells whether `row` holds every value of the filters `key` (as
+    returned by `query_key`), compared as the index compares them.
+    """
+    return all(normalize(row[FILTER_COLUMNS[column]]) == value
+               for column, value in key)
+
+
+class SecondaryIndex:
+    """
+    Posting lists of row positions for each filterable column.
+    """
+    MAX_CACHED_QUERIES = 128
+
+    def __init__(self, dataset: Sequence = ()):
+        """
+        Indexes every row of `dataset`.
+        """
+        self.__postings = {column: {} for column in FILTER_COLUMNS}
+        self.__queries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__size = 0
+        self.extend(dataset)
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def export(self) -> Tuple[Dict[str, array], Dict]:
+        """
+        Flattens the posting lists into typed arrays plus JSON metadata,
+        one concatenated positions array and one bounds array per column.
+        """
+        arrays = {}
+        keys = {}
+        for column, values in self.__postings.items():
+            positions = array("l")
+            bounds = array("q", [0])
+            for value in values.values():
+                positions.extend(value)
+                bounds.append(len(positions))
+            arrays["postings." + column] = positions
+            arrays["bounds." + column] = bounds
+            keys[column] = list(values)
+        return arrays, {"size": self.__size, "keys": keys}
+
+    @classmethod
+    def restore(cls, arrays: Mapping[str, Sequence],
+                meta: Mapping) -> "SecondaryIndex":
+        """
+        Rebuilds an index from `export` output without copying the
+        posting lists, which may be memoryviews over a mapped file.
+        """
+        index = cls()
+        for column, keys in meta["keys"].items():
+            positions = arrays["postings." + column]
+            bounds = arrays["bounds." + column]
+            index.__postings[column] = {
+                key: positions[bounds[i]:bounds[i + 1]]
+                for i, key in enumerate(keys)
+            }
+        index.__size = meta["size"]
+        return index
+
+    def extend(self, rows: Iterable[List]) -> None:
+        """
+        Indexes `rows` as the positions following the indexed ones.
+        """
+        postings = [(self.__postings[column], field)
+                    for column, field in FILTER_COLUMNS.items()]
+        pos = self.__size
+        for row in rows:
+            for values, field in postings:
+                key = normalize(row[field])
+                positions = values.get(key)
+                if not isinstance(positions, array):
+                    positions = values[key] = array("l", positions or ())
+                positions.append(pos)
+            pos += 1
+        self.__size = pos
+        with self.__lock:
+            self.__queries.clear()
+
+    def values(self, column: str) -> List[str]:
+        """
+        Returns the distinct (normalized) values of `column`.
+        """
+        return list(self.__postings[column])
+
+    def postings(self, column: str, value) -> Sequence[int]:
+        """
+        Returns the sorted positions where `column` equals `value`.
+        """
+        if column not in FILTER_COLUMNS:
+            raise ValueError("Unknown filter column: {}".format(column))
+        return self.__postings[column].get(normalize(value), array("l"))
+
+    def lookup(self, filters: Mapping) -> Sequence[int]:
+        """
+        Returns the sorted positions of the rows matching every filter.
+        """
+        key = query_key(filters)
+        with self.__lock:
+            cached = self.__queries.get(key)
+            if cached is not None:
+                self.__queries.move_to_end(key)
+                return cached
+        lists = sorted((self.postings(column, value)
+                        for column, value in key), key=len)
+        if not lists:
+            raise ValueError("At least one filter is required")
+        result = lists[0]
+        for other in lists[1:]:
+            result = intersect(result, other)
+            if not result:
+                break
+        with self.__lock:
+            self.__queries[key] = result
+            if len(self.__queries) > self.MAX_CACHED_QUERIES:
+                self.__queries.popitem(last=False)
+        return result
+
+
+def intersect(small: Sequence[int], large: Sequence[int]) -> array:
+    """
+    Intersects two sorted position lists by binary-searching each
+    element of the shorter one in the longer one.
+    """
+    result = array("l")
+    lo = 0
+    size = len(large)
+    for pos in small:
+        lo = bisect_left(large, pos, lo)
+        if lo == size:
+            break
+        if large[lo] == pos:
+            result.append(pos)
+    return result
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Dataset shared across worker processes through shared memory.
+
+One loader process publishes the columnar dataset and its secondary
+index, in the snapshot layout, into a `multiprocessing.shared_memory`
+segment; every Server then attaches to that segment read-only instead
+of keeping a private copy, so memory stays flat as workers are added.
+"""
+import hashlib
+import os
+import signal
+import sys
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, Set, Tuple
+
+from dataset_backends import ColumnarDataset
+from secondary_index import SecondaryIndex
+from snapshot import is_fresh, load_or_build, pack_dataset, unpack_dataset
+
+_attached: Dict[str, SharedMemory] = {}
+_published: Set[str] = set()
+
+
+def segment_name(csv_path: str) -> str:
+    """
+    Default shared memory segment name for `csv_path`.
+    """
+    path = os.path.abspath(csv_path).encode("utf-8")
+    return "bnames_" + hashlib.sha1(path).hexdigest()[:16]
+
+
+def publish(csv_path: str, name: str = None) -> SharedMemory:
+    """
+    Loads `csv_path` (through its snapshot) into a new segment.
+    The caller owns the segment and must `close()` and `unlink()` it.
+    """
+    blob = pack_dataset(*load_or_build(csv_path))
+    segment = SharedMemory(name or segment_name(csv_path), create=True,
+                           size=len(blob))
+    segment.buf[:len(blob)] = blob
+    _published.add(segment._name)
+    return segment
+
+
+class AttachedSegment(SharedMemory):
+    """
+    Segment attached by a reader. Views of it are handed out for the
+    lifetime of the process, so closing it while they exist is a no-op;
+    the mapping is released by the OS when the process exits.
+    """
+
+    def close(self) -> None:
+        try:
+            super().close()
+        except BufferError:
+            pass
+
+
+def _open(name: str) -> SharedMemory:
+    """
+    Opens an existing segment without leaving it registered with this
+    process's resource tracker, which would otherwise unlink it on exit
+    although the publisher owns it. Before Python 3.13 attaching always
+    registers the segment on POSIX, so it is unregistered right after,
+    unless this process published it: the tracker keeps one entry per
+    name, which then belongs to the publisher.
+    """
+    try:
+        return AttachedSegment(name, track=False)
+    except TypeError:
+        pass
+    segment = AttachedSegment(name)
+    if os.name == "posix" and segment._name not in _published:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def attach(name: str) -> Tuple[ColumnarDataset, SecondaryIndex, Dict]:
+    """
+    Maps the published dataset and index of segment `name` read-only,
+    along with the description of the CSV they were built from.
+    The segment stays attached for the lifetime of the process.
+    """
+    segment = _attached.get(name)
+    if segment is None:
+        segment = _attached[name] = _open(name)
+    return unpack_dataset(segment.buf.toreadonly())
+
+
+def backend(name: str = None) -> Callable[[str], ColumnarDataset]:
+    """
+    Returns a Server backend attaching to segment `name`, which defaults
+    to the segment published for the server's `DATA_FILE`; the CSV is
+    loaded through its snapshot instead if it changed since.
+    """
+    def load(csv_path: str) -> ColumnarDataset:
+        dataset, _, source = attach(name or segment_name(csv_path))
+        if not is_fresh(csv_path, source):
+            dataset = load_or_build(csv_path)[0]
+        return dataset
+    return load
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "Popular_Baby_Names.csv"
+    segment = publish(csv_path)
+    print("Published {} as {} ({} bytes)".format(
+        csv_path, segment.name, segment.size))
+    try:
+        signal.pause()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        segment.close()
+        segment.unlink()
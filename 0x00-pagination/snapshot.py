@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Binary snapshots of the parsed dataset and its secondary index.
+
+The first process to parse the CSV writes the columnar dataset and the
+posting lists next to it; later processes memory-map that file and use
+its arrays in place, skipping CSV parsing entirely. A snapshot is only
+used while the CSV keeps the size, and the modification time or
+SHA-256 digest, recorded in it.
+"""
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Dict, Optional, Sequence, Tuple
+
+from dataset_backends import COLUMNS, ColumnarDataset
+from secondary_index import SecondaryIndex
+
+MAGIC = b"BNSNAP1\n"
+ALIGNMENT = 8
+
+
+def pack(arrays: Dict[str, Sequence], meta: Dict) -> bytes:
+    """
+    Serializes typed `arrays` and JSON `meta` into one buffer: the magic,
+    the header length, a JSON header, then every array 8-byte aligned.
+    """
+    layout = {}
+    offset = 0
+    for name, values in arrays.items():
+        values = memoryview(values)
+        layout[name] = {
+            "typecode": values.format,
+            "itemsize": values.itemsize,
+            "offset": offset,
+            "length": len(values),
+        }
+        offset += -(-values.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "arrays": layout,
+        "meta": meta,
+    }).encode("utf-8")
+    start = len(MAGIC) + 8 + len(header)
+    start += -start % ALIGNMENT
+    blob = bytearray(start + offset)
+    blob[:len(MAGIC)] = MAGIC
+    struct.pack_into("<Q", blob, len(MAGIC), len(header))
+    blob[len(MAGIC) + 8:len(MAGIC) + 8 + len(header)] = header
+    for name, values in arrays.items():
+        raw = memoryview(values).cast("B")
+        pos = start + layout[name]["offset"]
+        blob[pos:pos + len(raw)] = raw
+    return bytes(blob)
+
+
+def unpack(buffer) -> Tuple[Dict[str, memoryview], Dict]:
+    """
+    Reads a `pack` buffer back as zero-copy memoryviews plus its meta.
+    Raises ValueError if the buffer is not a compatible snapshot or is
+    shorter than its header says.
+    """
+    view = memoryview(buffer)
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a dataset snapshot")
+    if len(view) < len(MAGIC) + 8:
+        raise ValueError("Snapshot is truncated")
+    size, = struct.unpack_from("<Q", view, len(MAGIC))
+    start = len(MAGIC) + 8
+    if start + size > len(view):
+        raise ValueError("Snapshot is truncated")
+    header = json.loads(bytes(view[start:start + size]).decode("utf-8"))
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError("Snapshot was written with another byte order")
+    start += size
+    start += -start % ALIGNMENT
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        if array(spec["typecode"]).itemsize != spec["itemsize"]:
+            raise ValueError("Snapshot item sizes do not match")
+        pos = start + spec["offset"]
+        end = pos + spec["length"] * spec["itemsize"]
+        if pos < start or end < pos or end > len(view):
+            raise ValueError("Snapshot is truncated")
+        arrays[name] = view[pos:end].cast(spec["typecode"])
+    return arrays, header["meta"]
+
+
+def file_digest(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of the file at `path`.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_path(csv_path: str) -> str:
+    """
+    Default location of the snapshot of `csv_path`.
+    """
+    return csv_path + ".snapshot"
+
+
+def describe(csv_path: str) -> Dict:
+    """
+    Records the size, modification time and digest of `csv_path`.
+    """
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_digest(csv_path)}
+
+
+def is_fresh(csv_path: str, source: Dict) -> bool:
+    """
+    Tells whether `source`, recorded in a snapshot, still describes the
+    CSV. The digest is only computed when the size matches but the
+    modification time does not, e.g. after a copy or a `touch`.
+    """
+    stat = os.stat(csv_path)
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+    return file_digest(csv_path) == source["sha256"]
+
+
+def pack_dataset(dataset: ColumnarDataset, index: SecondaryIndex,
+                 source: Dict = None) -> bytes:
+    """
+    Serializes a columnar dataset and its secondary index.
+    """
+    arrays, meta = dataset.export()
+    index_arrays, index_meta = index.export()
+    arrays = dict(arrays, **index_arrays)
+    return pack(arrays, {"source": source, "dataset": meta,
+                         "index": index_meta})
+
+
+def unpack_dataset(buffer) -> Tuple[ColumnarDataset, SecondaryIndex, Dict]:
+    """
+    Rebuilds the dataset and index of a `pack_dataset` buffer in place.
+    """
+    return restore(*unpack(buffer))
+
+
+def restore(arrays: Dict[str, memoryview], meta: Dict) -> Tuple[
+        ColumnarDataset, SecondaryIndex, Dict]:
+    """
+    Rebuilds the dataset and index of unpacked snapshot arrays.
+    """
+    tables = {name: [sys.intern(value) for value in values]
+              for name, values in meta["dataset"]["tables"].items()}
+    dataset = ColumnarDataset({name: arrays[name] for name in COLUMNS},
+                              tables)
+    index = SecondaryIndex.restore(arrays, meta["index"])
+    return dataset, index, meta["source"]
+
+
+def load(csv_path: str, path: str = None) -> Optional[
+        Tuple[ColumnarDataset, SecondaryIndex, Dict]]:
+    """
+    Maps the snapshot of `csv_path`, or returns None if it is missing,
+    unreadable, damaged or stale. The third item describes the CSV it
+    was built from, as recorded by `describe`.
+    """
+    path = path or snapshot_path(csv_path)
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        arrays, meta = unpack(mapped)
+        if not is_fresh(csv_path, meta["source"]):
+            return None
+        return restore(arrays, meta)
+    except (OSError, ValueError, KeyError, IndexError, TypeError,
+            struct.error):
+        return None
+
+
+def save(csv_path: str, dataset: ColumnarDataset, index: SecondaryIndex,
+         path: str = None, source: Dict = None) -> bool:
+    """
+    Atomically writes the snapshot of `csv_path`; returns False when it
+    cannot be written, since a snapshot is only an optimization.
+    """
+    path = path or snapshot_path(csv_path)
+    try:
+        blob = pack_dataset(dataset, index, source or describe(csv_path))
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+    except OSError:
+        os.unlink(tmp)
+        return False
+    return True
+
+
+def load_or_build(csv_path: str, path: str = None) -> Tuple[
+        ColumnarDataset, SecondaryIndex, Dict]:
+    """
+    Loads the snapshot of `csv_path`, or parses the CSV and writes one.
+    Returns the dataset, its index and the description of the CSV.
+    """
+    loaded = load(csv_path, path)
+    if loaded is not None:
+        return loaded
+    source = describe(csv_path)
+    with open(csv_path) as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        dataset = ColumnarDataset.from_rows(reader)
+    index = SecondaryIndex(dataset)
+    save(csv_path, dataset, index, path, source)
+    return dataset, index, source
+
+
+def load_columnar(csv_path: str) -> ColumnarDataset:
+    """
+    Server backend returning the snapshotted columnar dataset.
+    """
+    return load_or_build(csv_path)[0]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Precomputed sort orders for sorted pagination.
+
+Sorting a column produces a permutation array: the row positions in
+sorted order, built once on first use and cached, so a sorted page is a
+slice of it. The inverse permutation gives the rank of every position
+and lets a subset of the rows (the matches of a filter) be put in the
+same order without sorting the rows themselves again.
+"""
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Hashable, Sequence, Tuple
+
+from dataset_backends import CATEGORICAL
+from secondary_index import normalize
+
+SORT_COLUMNS = {
+    "year": 0, "gender": 1, "ethnicity": 2, "name": 3, "count": 4, "rank": 5,
+}
+NUMERIC_COLUMNS = ("year", "count", "rank")
+SORT_KEYS = frozenset(list(SORT_COLUMNS) +
+                      ["-" + column for column in SORT_COLUMNS])
+
+
+def parse_sort(sort: str) -> Tuple[str, bool]:
+    """
+    Splits a sort key such as "name" or "-count" (descending) into its
+    column and whether the order is descending.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError("Unknown sort key: {}".format(sort))
+    if sort.startswith("-"):
+        return sort[1:], True
+    return sort, False
+
+
+class SortIndex:
+    """
+    Lazily built permutations of the first `size` rows of a dataset.
+
+    Text columns sort case-insensitively, numbers numerically, and rows
+    with equal values keep their file order in either direction.
+    """
+    MAX_CACHED_ORDERS = 128
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, dataset: Sequence, size: int = None, metrics=None):
+        """
+        Sorts `dataset`, or only its first `size` rows, on demand.
+        Build times are reported to the `metrics` sink, if any.
+        """
+        self.size = len(dataset) if size is None else size
+        self.__dataset = dataset
+        self.__metrics = metrics
+        self.__permutations = {}
+        self.__inverses = {}
+        self.__orders = OrderedDict()
+        self.__lock = threading.RLock()
+
+    def __keys(self, column: str) -> Sequence:
+        """
+        Returns the sort key of every row for `column`. Encoded columns
+        of a ColumnarDataset are used as is, categorical codes being
+        mapped to the rank of their value; other datasets are read in
+        chunks of rows.
+        """
+        dataset = self.__dataset
+        if hasattr(dataset, "column"):
+            values = dataset.column(column)
+            if column not in CATEGORICAL:
+                return values
+            table = dataset.table(column)
+            ranks = [0] * len(table)
+            by_value = sorted(range(len(table)),
+                              key=lambda code: normalize(table[code]))
+            for rank, code in enumerate(by_value):
+                ranks[code] = rank
+            return [ranks[code] for code in values[:self.size]]
+        field = SORT_COLUMNS[column]
+        convert = int if column in NUMERIC_COLUMNS else normalize
+        keys = []
+        for start in range(0, self.size, self.CHUNK_SIZE):
+            end = min(start + self.CHUNK_SIZE, self.size)
+            keys.extend(convert(row[field]) for row in dataset[start:end])
+        return keys
+
+    def permutation(self, sort: str) -> array:
+        """
+        Returns the row positions in `sort` order.
+        """
+        permutation = self.__permutations.get(sort)
+        if permutation is None:
+            column, descending = parse_sort(sort)
+            with self.__lock:
+                if sort not in self.__permutations:
+                    start = time.perf_counter()
+                    keys = self.__keys(column)
+                    self.__permutations[sort] = array("l", sorted(
+                        range(self.size), key=keys.__getitem__,
+                        reverse=descending))
+                    if self.__metrics is not None:
+                        self.__metrics.observe(
+                            "pagination_index_build_seconds",
+                            time.perf_counter() - start, index="sort")
+                permutation = self.__permutations[sort]
+        return permutation
+
+    def inverse(self, sort: str) -> array:
+        """
+        Returns the rank of every row position in `sort` order.
+        """
+        inverse = self.__inverses.get(sort)
+        if inverse is None:
+            with self.__lock:
+                if sort not in self.__inverses:
+                    permutation = self.permutation(sort)
+                    ranks = array("l", bytes(permutation.itemsize *
+                                             len(permutation)))
+                    for rank, pos in enumerate(permutation):
+                        ranks[pos] = rank
+                    self.__inverses[sort] = ranks
+                inverse = self.__inverses[sort]
+        return inverse
+
+    def order(self, positions: Sequence[int], sort: str,
+              key: Hashable = None) -> Sequence[int]:
+        """
+        Returns `positions` rearranged in `sort` order, cached under
+        `key` (e.g. the filter that selected them) when one is given.
+        """
+        if key is not None:
+            with self.__lock:
+                cached = self.__orders.get((key, sort))
+                if cached is not None:
+                    self.__orders.move_to_end((key, sort))
+                    return cached
+        inverse = self.inverse(sort)
+        ordered = array("l", sorted(positions, key=inverse.__getitem__))
+        if key is not None:
+            with self.__lock:
+                self.__orders[(key, sort)] = ordered
+                if len(self.__orders) > self.MAX_CACHED_ORDERS:
+                    self.__orders.popitem(last=False)
+        return ordered
@@ -43,7 +43,7 @@ class BasicCache(BaseCaching):
            limitation on cache size.
     '''
 
-    def put(self, key, item):
+    def put(self, key, item, ttl=None):
         '''Assigns the provided `item` value to the specified `key` within
            the dictionary `self.cache_data`. This method will only add the
            item if both `key` and `item` are not `None`. If either is `None`,
@@ -59,6 +59,9 @@ class BasicCache(BaseCaching):
                item (Any): The actual data or value associated with `key`.
                When added to the cache, `item` will be accessible through the
                corresponding `key` provided to this method.
+               ttl (float): Optional lifetime of `item` in seconds, after
+               which `get` no longer returns it; the cache's `ttl` (if
+               any) is used when `ttl` is `None`.
 
            Returns:
                None: This method does not return a value. Instead, it updates
@@ -67,6 +70,8 @@ class BasicCache(BaseCaching):
                restrictions or limits.
         '''
         if key is not None and item is not None:
+            self._reclaim()
+            self._track(key, 0, key not in self.cache_data, ttl)
             self.cache_data[key] = item
 
     def get(self, key):
@@ -96,4 +101,9 @@ class BasicCache(BaseCaching):
                indicating the absence of data for that key.
         '''
 
-        return self.cache_data.get(key, None)
+        item = self.cache_data[key] if self._live(key) else None
+        if item is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return item
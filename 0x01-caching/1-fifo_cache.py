@@ -13,26 +13,43 @@ class FIFOCache(BaseCaching):
     in a dictionary-like cahe, where the oldest entries
     are removed first once the cache reaches its max capacity
     """
-    def __init__(self):
+    def __init__(self, max_items=None, max_weight=None, weigher=None,
+                 ttl=None, clock=None):
         """
         This sets up the cache storage with the neccessary cofigurations
+        holding up to `max_items` items (`MAX_ITEMS` by default) and,
+        if given, `max_weight` in total as measured by `weigher`, each
+        item living `ttl` seconds at most, if given, by `clock`
         """
-        super().__init__()
+        super().__init__(max_items, max_weight, weigher, ttl, clock)
         self.cache_data = OrderedDict()
 
-    def put(self, key, item):
+    def put(self, key, item, ttl=None):
         """
-        inserts item into cache
+        inserts item into cache, expiring after `ttl` seconds if given
         """
         if key is None or item is None:
             return
+        weight = self._weigh(item)
+        if not self._make_room(key, weight, self.__first_in):
+            return
+        inserted = key not in self.cache_data
         self.cache_data[key] = item
-        if len(self.cache_data) > BaseCaching.MAX_ITEMS:
-            first_key, _ = self.cache_data.popitem(False)
-            print("DISCARD:", first_key)
+        self._track(key, weight, inserted, ttl)
+
+    def __first_in(self, key):
+        """
+        the oldest key other than `key`, evicted first
+        """
+        return next((k for k in self.cache_data if k != key), None)
 
     def get(self, key):
         """
         fetches an item from the cahce using its key
         """
-        return self.cache_data.get(key, None)
+        item = self.cache_data[key] if self._live(key) else None
+        if item is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return item
@@ -19,56 +19,110 @@ class LFUCache(BaseCaching):
     providing quick access to frequently used
     items while efficiently discarding
     those that are rarely needed.
+    Keys are grouped in one bucket per access frequency; each
+    bucket is an ordered dictionary (a doubly linked list) from
+    least to most recently used, and the non-empty frequencies
+    are themselves linked in increasing order from the lowest,
+    so get, put, eviction and discards all run in O(1).
+    Among keys of equal frequency, the least recently used
+    one is discarded first.
     """
-    def __init__(self):
+    def __init__(self, max_items=None, max_weight=None, weigher=None,
+                 ttl=None, clock=None):
         """Initializes the LFU cache, establishing the
         foundation for optimal data
         management. This constructor creates an ordered
         dictionary to store cached
-        items and a list to keep track of the
-        frequency of access for each item.
+        items, the access frequency of each key, and
+        the frequency buckets, each linked to the next
+        lower and higher one, from the minimum.
+        Args:
+            max_items: How many items fit, `MAX_ITEMS` by default.
+            max_weight: Optional budget for the total weight.
+            weigher: Weight of an item, `sys.getsizeof` by default.
+            ttl: Default lifetime of the items in seconds, if any.
+            clock: Time source, `time.monotonic` by default.
         """
-        super().__init__()
+        super().__init__(max_items, max_weight, weigher, ttl, clock)
         self.cache_data = OrderedDict()
-        self.keys_freq = []
+        self.__freqs = {}
+        self.__buckets = {}
+        self.__links = {}
+        self.__min_freq = None
+
+    def __link(self, freq, lower):
+        """Creates the empty bucket of `freq` right above
+        the bucket of frequency `lower`, or below all of
+        them when `lower` is None.
+        """
+        if lower is None:
+            higher = self.__min_freq
+            self.__min_freq = freq
+        else:
+            higher = self.__links[lower][1]
+            self.__links[lower][1] = freq
+        if higher is not None:
+            self.__links[higher][0] = freq
+        self.__links[freq] = [lower, higher]
+        self.__buckets[freq] = OrderedDict()
 
-    def __reorder_items(self, mru_key):
-        """Reorders the cache items based on the
-        most recently used key, adjusting
-        their frequency of access. This private
-        method updates the frequency list
-        to reflect the recent access, ensuring
-        that the LFU strategy effectively
-        identifies which item should be discarded
-        when the cache limit is reached.
+    def __unlink(self, freq):
+        """Drops the emptied bucket of `freq`, joining its
+        neighbours; the minimum moves up to the next bucket
+        when the lowest one goes.
+        """
+        lower, higher = self.__links.pop(freq)
+        del self.__buckets[freq]
+        if lower is None:
+            self.__min_freq = higher
+        else:
+            self.__links[lower][1] = higher
+        if higher is not None:
+            self.__links[higher][0] = lower
+
+    def __touch(self, key):
+        """Moves a key up to the next frequency bucket,
+        where it becomes the most recently used key.
         Args:
-            mru_key: The key of the item that was
+            key: The key of the item that was
             recently accessed, used to update
             its frequency and position in the access order.
         """
-        max_positions = []
-        mru_freq = 0
-        mru_pos = 0
-        ins_pos = 0
-        
-        for i, key_freq in enumerate(self.keys_freq):
-            if key_freq[0] == mru_key:
-                mru_freq = key_freq[1] + 1
-                mru_pos = i
-                break
-            elif len(max_positions) == 0 or key_freq[1] < self.keys_freq[max_positions[-1]][1]:
-                max_positions.append(i)
+        freq = self.__freqs[key]
+        if freq + 1 not in self.__buckets:
+            self.__link(freq + 1, freq)
+        self.__buckets[freq + 1][key] = None
+        self.__freqs[key] = freq + 1
+        bucket = self.__buckets[freq]
+        del bucket[key]
+        if not bucket:
+            self.__unlink(freq)
 
-        max_positions.reverse()
-        for pos in max_positions:
-            if self.keys_freq[pos][1] > mru_freq:
-                break
-            ins_pos = pos
+    def __least_frequent(self, key):
+        """Picks the least recently used key of the
+        lowest frequency bucket, other than `key`.
+        `key` sits in a single bucket, so at most one
+        bucket is skipped before the victim is found.
+        """
+        freq = self.__min_freq
+        while freq is not None:
+            for lfu_key in self.__buckets[freq]:
+                if lfu_key != key:
+                    return lfu_key
+            freq = self.__links[freq][1]
+        return None
 
-        self.keys_freq.pop(mru_pos)
-        self.keys_freq.insert(ins_pos, [mru_key, mru_freq])
+    def _forget(self, key):
+        """Removes a discarded key from its frequency bucket,
+        unlinking the bucket if it is left empty.
+        """
+        freq = self.__freqs.pop(key)
+        bucket = self.__buckets[freq]
+        del bucket[key]
+        if not bucket:
+            self.__unlink(freq)
 
-    def put(self, key, item):
+    def put(self, key, item, ttl=None):
         """Adds a new item to the cache or updates
         an existing item, maintaining
         the integrity of the LFU strategy.
@@ -79,31 +133,28 @@ class LFUCache(BaseCaching):
         Args:
             key: A unique identifier for the item to be cached.
             item: The data or object to be stored in the cache.
+            ttl: Lifetime of the item in seconds, the default if None.
         If either the key or item is None,
         the operation is ignored to avoid
         invalid entries.
         """
         if key is None or item is None:
             return
-        
-        if key not in self.cache_data:
-            if len(self.cache_data) + 1 > BaseCaching.MAX_ITEMS:
-                lfu_key, _ = self.keys_freq[-1]
-                self.cache_data.pop(lfu_key)
-                self.keys_freq.pop()
-                print("DISCARD:", lfu_key)
-                
+
+        weight = self._weigh(item)
+        if not self._make_room(key, weight, self.__least_frequent):
+            return
+        inserted = key not in self.cache_data
+        if inserted:
             self.cache_data[key] = item
-            ins_index = len(self.keys_freq)
-            
-            for i, key_freq in enumerate(self.keys_freq):
-                if key_freq[1] == 0:
-                    ins_index = i
-                    break
-            self.keys_freq.insert(ins_index, [key, 0])
+            self.__freqs[key] = 0
+            if 0 not in self.__buckets:
+                self.__link(0, None)
+            self.__buckets[0][key] = None
         else:
             self.cache_data[key] = item
-            self.__reorder_items(key)
+            self.__touch(key)
+        self._track(key, weight, inserted, ttl)
 
     def get(self, key):
         """Retrieves an item from the cache based on
@@ -118,6 +169,9 @@ class LFUCache(BaseCaching):
         Returns:
             The cached item if found; otherwise, returns None.
         """
-        if key is not None and key in self.cache_data:
-            self.__reorder_items(key)
-        return self.cache_data.get(key, None)
+        if self._live(key):
+            self.hits += 1
+            self.__touch(key)
+            return self.cache_data[key]
+        self.misses += 1
+        return None
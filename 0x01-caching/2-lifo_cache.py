@@ -11,29 +11,44 @@ class LIFOCache(BaseCaching):
     Items are stored in a dictionary, and when the cache
     reaches its max size, the last one in is the first one out.
     """
-    def __init__(self):
+    def __init__(self, max_items=None, max_weight=None, weigher=None,
+                 ttl=None, clock=None):
         """Prepares an orderly cache for storing items with
         a Last-In, First-Out approach.
+        Args:
+            max_items: How many items fit, `MAX_ITEMS` by default.
+            max_weight: Optional budget for the total weight.
+            weigher: Weight of an item, `sys.getsizeof` by default.
+            ttl: Default lifetime of the items in seconds, if any.
+            clock: Time source, `time.monotonic` by default.
         """
-        super().__init__()
+        super().__init__(max_items, max_weight, weigher, ttl, clock)
         self.cache_data = OrderedDict()
 
-    def put(self, key, item):
+    def put(self, key, item, ttl=None):
         """Adds a new item to the cache with a LIFO flourish!
         If adding this item exceeds the cache limit, the most
         recent entry is dramatically removed to make space.
         Args:
             key: The identifier for the cached item.
             item: The data or object to be cached.
+            ttl: Lifetime of the item in seconds, the default if None.
         """
         if key is None or item is None:
             return
-        if key not in self.cache_data:
-            if len(self.cache_data) + 1 > BaseCaching.MAX_ITEMS:
-                last_key, _ = self.cache_data.popitem(True)
-                print("DISCARD:", last_key)
+        weight = self._weigh(item)
+        if not self._make_room(key, weight, self.__last_in):
+            return
+        inserted = key not in self.cache_data
         self.cache_data[key] = item
         self.cache_data.move_to_end(key, last=True)
+        self._track(key, weight, inserted, ttl)
+
+    def __last_in(self, key):
+        """Finds the newest key other than `key`, the next to go.
+        """
+        return next((k for k in reversed(self.cache_data) if k != key),
+                    None)
 
     def get(self, key):
         """Retrieves an item by its key, if it exists.
@@ -42,4 +57,9 @@ class LIFOCache(BaseCaching):
         Returns:
             The cached item if it exists; otherwise, None.
         """
-        return self.cache_data.get(key, None)
+        item = self.cache_data[key] if self._live(key) else None
+        if item is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return item
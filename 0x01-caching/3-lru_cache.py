@@ -13,14 +13,21 @@ class LRUCache(BaseCaching):
     This cache manages items with an LRU (Least Recently Used) policy,
     seamlessly removing the oldest unused item when the limit is reached.
     """
-    def __init__(self):
+    def __init__(self, max_items=None, max_weight=None, weigher=None,
+                 ttl=None, clock=None):
         """
         Prepares the cache, primed and ready to store data with style!
+        Args:
+            max_items: How many items fit, `MAX_ITEMS` by default.
+            max_weight: Optional budget for the total weight.
+            weigher: Weight of an item, `sys.getsizeof` by default.
+            ttl: Default lifetime of the items in seconds, if any.
+            clock: Time source, `time.monotonic` by default.
         """
-        super().__init__()
+        super().__init__(max_items, max_weight, weigher, ttl, clock)
         self.cache_data = OrderedDict()
 
-    def put(self, key, item):
+    def put(self, key, item, ttl=None):
         """
         Adds an item to the cache, preserving only the most active entries.
         If the cache reaches its max capacity,
@@ -29,17 +36,28 @@ class LRUCache(BaseCaching):
         Args:
             key: The unique identifier for the item to store.
             item: The data or object to be cached.
+            ttl: Lifetime of the item in seconds, the default if None.
         """
         if key is None or item is None:
             return
-        if key not in self.cache_data:
-            if len(self.cache_data) + 1 > BaseCaching.MAX_ITEMS:
-                lru_key, _ = self.cache_data.popitem(True)
-                print("DISCARD:", lru_key)
+        weight = self._weigh(item)
+        if not self._make_room(key, weight, self.__least_recent):
+            return
+        inserted = key not in self.cache_data
+        if inserted:
             self.cache_data[key] = item
             self.cache_data.move_to_end(key, last=False)
         else:
             self.cache_data[key] = item
+        self._track(key, weight, inserted, ttl)
+
+    def __least_recent(self, key):
+        """
+        Picks the least recently used key other than `key`,
+        sitting at the back of the line.
+        """
+        return next((k for k in reversed(self.cache_data) if k != key),
+                    None)
 
     def get(self, key):
         """
@@ -51,6 +69,9 @@ class LRUCache(BaseCaching):
         Returns:
             The cached item if available; otherwise, None.
         """
-        if key is not None and key in self.cache_data:
+        if self._live(key):
+            self.hits += 1
             self.cache_data.move_to_end(key, last=False)
-        return self.cache_data.get(key, None)
+            return self.cache_data[key]
+        self.misses += 1
+        return None
@@ -13,15 +13,22 @@ class MRUCache(BaseCaching):
     When the cache limit is reached, the least recently used item is
     removed, promoting a streamlined caching experience.
     """
-    def __init__(self):
+    def __init__(self, max_items=None, max_weight=None, weigher=None,
+                 ttl=None, clock=None):
         """Initializes the MRU cache, setting the stage for high-performance
         data management. This constructor prepares the cache by establishing
         an ordered dictionary to maintain the access order of cached items.
+        Args:
+            max_items: How many items fit, `MAX_ITEMS` by default.
+            max_weight: Optional budget for the total weight.
+            weigher: Weight of an item, `sys.getsizeof` by default.
+            ttl: Default lifetime of the items in seconds, if any.
+            clock: Time source, `time.monotonic` by default.
         """
-        super().__init__()
+        super().__init__(max_items, max_weight, weigher, ttl, clock)
         self.cache_data = OrderedDict()
 
-    def put(self, key, item):
+    def put(self, key, item, ttl=None):
         """Inserts an item into the cache, ensuring that the most
         relevant data is stored for quick retrieval.
         If the cache exceeds its maximum capacity, the least recently
@@ -30,19 +37,28 @@ class MRUCache(BaseCaching):
         Args:
             key: A unique identifier for the item being cached.
             item: The data or object to be stored in the cache.
+            ttl: Lifetime of the item in seconds, the default if None.
         If either the key or item is None, this method does nothing,
         safeguarding against invalid entries.
         """
         if key is None or item is None:
             return
-        if key not in self.cache_data:
-            if len(self.cache_data) + 1 > BaseCaching.MAX_ITEMS:
-                mru_key, _ = self.cache_data.popitem(False)
-                print("DISCARD:", mru_key)
+        weight = self._weigh(item)
+        if not self._make_room(key, weight, self.__most_recent):
+            return
+        inserted = key not in self.cache_data
+        if inserted:
             self.cache_data[key] = item
             self.cache_data.move_to_end(key, last=False)
         else:
             self.cache_data[key] = item
+        self._track(key, weight, inserted, ttl)
+
+    def __most_recent(self, key):
+        """Picks the most recently used key other than `key`,
+        kept at the front of the cache.
+        """
+        return next((k for k in self.cache_data if k != key), None)
 
     def get(self, key):
         """Retrieves an item from the cache based on its key, ensuring
@@ -54,6 +70,9 @@ class MRUCache(BaseCaching):
         Returns:
             The cached item if it exists; otherwise, returns None.
         """
-        if key is not None and key in self.cache_data:
+        if self._live(key):
+            self.hits += 1
             self.cache_data.move_to_end(key, last=False)
-        return self.cache_data.get(key, None)
+            return self.cache_data[key]
+        self.misses += 1
+        return None
@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+""" BaseCaching module
+"""
+import sys
+import time
+from timer_wheel import TimerWheel
+
+CAPACITY = "capacity"
+OVERSIZE = "oversize"
+EXPIRED = "expired"
+
+
+def print_discard(key, item, reason):
+    """ Eviction listener printing the discarded key
+    """
+    print("DISCARD:", key)
+
+
+class BaseCaching():
+    """ BaseCaching defines:
+      - constants of your caching system
+      - where your data are stored (in a dictionary)
+      - the capacity of each cache: a number of items, `MAX_ITEMS` by
+        default, and optionally a total weight, each item weighing
+        `weigher(item)` (by default its `sys.getsizeof`)
+      - an optional time-to-live, `ttl` seconds by default or given
+        to `put`: expired items are never returned by `get`, and are
+        reclaimed in bulk by a timer wheel on the next `put`
+      - eviction listeners, called as `listener(key, item, reason)` with
+        reason CAPACITY (making room), OVERSIZE (item over the weight
+        budget) or EXPIRED; `print_discard` prints the evicted key
+      - hit, miss, insert, update, eviction and expiration counters,
+        see `stats`
+    """
+    MAX_ITEMS = 4
+    TTL_RESOLUTION = 1.0
+
+    def __init__(self, max_items=None, max_weight=None, weigher=None,
+                 ttl=None, clock=None):
+        """ Initiliaze
+        """
+        self.cache_data = {}
+        self.max_items = self.MAX_ITEMS if max_items is None else max_items
+        self.max_weight = max_weight
+        self.weigher = weigher or sys.getsizeof
+        self.weight = 0
+        self.__weights = {}
+        self.ttl = ttl
+        self.clock = clock or time.monotonic
+        self.__deadlines = {}
+        self.__wheel = None
+        self.listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.updates = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def print_cache(self):
+        """ Print the cache
+        """
+        self._reclaim()
+        print("Current cache:")
+        for key in sorted(self.cache_data.keys()):
+            print("{}: {}".format(key, self.cache_data.get(key)))
+
+    def put(self, key, item):
+        """ Add an item in the cache
+        """
+        raise NotImplementedError(
+            "put must be implemented in your cache class")
+
+    def get(self, key):
+        """ Get an item by key
+        """
+        raise NotImplementedError(
+            "get must be implemented in your cache class")
+
+    def add_listener(self, listener):
+        """ Calls `listener(key, item, reason)` on every eviction
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """ Stops calling `listener` on evictions
+        """
+        self.listeners.remove(listener)
+
+    def stats(self):
+        """ Snapshot of the counters and the occupancy
+        """
+        self._reclaim()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "inserts": self.inserts,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self.cache_data),
+            "max_items": self.max_items,
+            "weight": self.weight,
+            "max_weight": self.max_weight,
+        }
+
+    def _weigh(self, item):
+        """ Weight of an item, 0 when the cache has no weight budget
+        """
+        if self.max_weight is None:
+            return 0
+        return self.weigher(item)
+
+    def _has_room(self, key, weight):
+        """ Tells whether `key` can hold an item of `weight`
+        without exceeding the capacity
+        """
+        items = len(self.cache_data) + (key not in self.cache_data)
+        if items > self.max_items:
+            return False
+        if self.max_weight is None:
+            return True
+        weight += self.weight - self.__weights.get(key, 0)
+        return weight <= self.max_weight
+
+    def _make_room(self, key, weight, victim):
+        """ Discards the entries picked by `victim(key)`, which returns
+        the next key to evict other than `key` (or None), until `key` can
+        hold an item of `weight`. Returns False, discarding the current
+        item of `key`, if it cannot fit at all. Expired entries go first.
+        """
+        self._reclaim()
+        if self.max_weight is not None and weight > self.max_weight:
+            if key in self.cache_data:
+                self._discard(key, OVERSIZE)
+            return False
+        while not self._has_room(key, weight):
+            old_key = victim(key)
+            if old_key is None:
+                return False
+            self._discard(old_key)
+        return True
+
+    def _track(self, key, weight, inserted, ttl=None):
+        """ Records the weight of the item just stored under `key`,
+        counts it as an insert or an update and schedules its expiry
+        after `ttl` seconds, `self.ttl` by default
+        """
+        if inserted:
+            self.inserts += 1
+        else:
+            self.updates += 1
+        if self.max_weight is not None:
+            self.weight += weight - self.__weights.get(key, 0)
+            self.__weights[key] = weight
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is None:
+            if self.__deadlines.pop(key, None) is not None:
+                self.__wheel.cancel(key)
+            return
+        now = self.clock()
+        if self.__wheel is None:
+            self.__wheel = TimerWheel(now, self.TTL_RESOLUTION)
+        self.__deadlines[key] = now + ttl
+        self.__wheel.schedule(key, now + ttl)
+
+    def _live(self, key):
+        """ Tells whether `key` holds an item that has not expired,
+        discarding it if it has
+        """
+        if key not in self.cache_data:
+            return False
+        deadline = self.__deadlines.get(key)
+        if deadline is not None and self.clock() >= deadline:
+            self._discard(key, EXPIRED)
+            return False
+        return True
+
+    def _reclaim(self):
+        """ Discards every entry whose deadline the timer wheel has
+        passed, without looking at the others
+        """
+        if not self.__deadlines:
+            return
+        for key in self.__wheel.advance(self.clock()):
+            self._discard(key, EXPIRED)
+
+    def _forget(self, key):
+        """ Drops the policy state of `key`; overridden by policies
+        keeping more than the order of `cache_data`
+        """
+
+    def _discard(self, key, reason=CAPACITY):
+        """ Evicts `key` from the cache and notifies the listeners
+        """
+        self._forget(key)
+        item = self.cache_data.pop(key)
+        self.weight -= self.__weights.pop(key, 0)
+        if self.__deadlines.pop(key, None) is not None:
+            self.__wheel.cancel(key)
+        if reason == EXPIRED:
+            self.expirations += 1
+        else:
+            self.evictions += 1
+        for listener in self.listeners:
+            listener(key, item, reason)
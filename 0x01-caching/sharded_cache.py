@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Thread-safe caches: every policy split across independently
+locked shards.
+
+A key always lives in the shard picked by its hash, and each shard is
+a complete cache of the chosen policy with its own lock, so threads
+working on different shards never wait for each other and `get` calls
+that reorder a shard (LRU, MRU, LFU) cannot corrupt it.
+
+Eviction is only approximately global: the capacity (items and weight)
+is split evenly between the shards and each shard evicts its own
+victim, e.g. its least recently used key, when it is full. With keys
+spread evenly by their hash the cache behaves close to one big cache
+of the same policy, but a shard receiving more than its share of keys
+evicts before the cache as a whole is full, and its victim is only the
+best candidate of that shard. Likewise an item heavier than the
+weight share of one shard is refused even if the whole budget would
+hold it.
+"""
+import threading
+import time
+from base_caching import BaseCaching
+
+FIFOCache = __import__('1-fifo_cache').FIFOCache
+LIFOCache = __import__('2-lifo_cache').LIFOCache
+LRUCache = __import__('3-lru_cache').LRUCache
+MRUCache = __import__('4-mru_cache').MRUCache
+LFUCache = __import__('100-lfu_cache').LFUCache
+
+
+class ShardedCache():
+    """A cache of `policy` split across `shards` locked shards.
+    It offers the interface of the caches derived from BaseCaching:
+    put, get, print_cache, stats and eviction listeners.
+    """
+    POLICY = None
+
+    def __init__(self, max_items=None, max_weight=None, weigher=None,
+                 ttl=None, clock=None, shards=16, policy=None):
+        """Splits `max_items` (`MAX_ITEMS` by default) and the optional
+        `max_weight` evenly, rounding up, between `shards` caches of
+        `policy` (the class `POLICY` by default), all sharing the
+        default `ttl` and the `clock`.
+        """
+        policy = policy or self.POLICY
+        if max_items is None:
+            max_items = BaseCaching.MAX_ITEMS
+        shards = max(1, min(shards, max_items))
+        per_weight = None
+        if max_weight is not None:
+            per_weight = -(-max_weight // shards)
+        self.max_items = max_items
+        self.max_weight = max_weight
+        self.ttl = ttl
+        self.__shards = [policy(-(-max_items // shards), per_weight,
+                                weigher, ttl, clock)
+                         for _ in range(shards)]
+        self.__locks = [threading.Lock() for _ in range(shards)]
+
+    def __shard(self, key):
+        """Returns the index of the shard holding `key`.
+        """
+        return hash(key) % len(self.__shards)
+
+    def put(self, key, item, ttl=None):
+        """Stores `item` under `key` in its shard for `ttl` seconds
+        (the default if None), evicting from that shard only.
+        """
+        if key is None or item is None:
+            return
+        i = self.__shard(key)
+        with self.__locks[i]:
+            self.__shards[i].put(key, item, ttl)
+
+    def get(self, key):
+        """Returns the item stored under `key`, or None.
+        """
+        if key is None:
+            return None
+        i = self.__shard(key)
+        with self.__locks[i]:
+            return self.__shards[i].get(key)
+
+    @property
+    def cache_data(self):
+        """A snapshot of every shard's items, in one dictionary;
+        expired items are reclaimed first.
+        """
+        data = {}
+        for lock, shard in zip(self.__locks, self.__shards):
+            with lock:
+                shard._reclaim()
+                data.update(shard.cache_data)
+        return data
+
+    def print_cache(self):
+        """Prints the items of every shard, sorted by key.
+        """
+        data = self.cache_data
+        print("Current cache:")
+        for key in sorted(data.keys()):
+            print("{}: {}".format(key, data.get(key)))
+
+    def add_listener(self, listener):
+        """Calls `listener(key, item, reason)` on every eviction; it runs
+        while the shard of the evicted key is locked.
+        """
+        for lock, shard in zip(self.__locks, self.__shards):
+            with lock:
+                shard.add_listener(listener)
+
+    def remove_listener(self, listener):
+        """Stops calling `listener` on evictions.
+        """
+        for lock, shard in zip(self.__locks, self.__shards):
+            with lock:
+                shard.remove_listener(listener)
+
+    def stats(self):
+        """The counters and occupancy summed over the shards.
+        """
+        totals = {}
+        for lock, shard in zip(self.__locks, self.__shards):
+            with lock:
+                stats = shard.stats()
+            for name in ("hits", "misses", "inserts", "updates",
+                         "evictions", "expirations", "size", "weight"):
+                totals[name] = totals.get(name, 0) + stats[name]
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+        totals["max_items"] = self.max_items
+        totals["max_weight"] = self.max_weight
+        totals["shards"] = len(self.__shards)
+        return totals
+
+
+class ShardedFIFOCache(ShardedCache):
+    """Thread-safe FIFOCache.
+    """
+    POLICY = FIFOCache
+
+
+class ShardedLIFOCache(ShardedCache):
+    """Thread-safe LIFOCache.
+    """
+    POLICY = LIFOCache
+
+
+class ShardedLRUCache(ShardedCache):
+    """Thread-safe LRUCache.
+    """
+    POLICY = LRUCache
+
+
+class ShardedMRUCache(ShardedCache):
+    """Thread-safe MRUCache.
+    """
+    POLICY = MRUCache
+
+
+class ShardedLFUCache(ShardedCache):
+    """Thread-safe LFUCache.
+    """
+    POLICY = LFUCache
+
+
+def benchmark(cache, threads, operations=200000, keys=10000):
+    """Runs `operations` mixed gets and puts (80% gets) on `cache`
+    split across `threads` threads; returns operations per second.
+    """
+    def work(seed):
+        key = seed
+        for n in range(operations // threads):
+            key = (key * 1103515245 + 12345) % keys
+            if n % 5:
+                cache.get(key)
+            else:
+                cache.put(key, n)
+
+    workers = [threading.Thread(target=work, args=(i,))
+               for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return operations / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    for name, sharded in (("LRU", ShardedLRUCache),
+                          ("LFU", ShardedLFUCache)):
+        for threads in (1, 2, 4, 8):
+            single = benchmark(sharded(5000, shards=1), threads)
+            split = benchmark(sharded(5000, shards=16), threads)
+            print("{} threads={}: 1 shard {:,.0f} ops/s, "
+                  "16 shards {:,.0f} ops/s".format(name, threads,
+                                                   single, split))
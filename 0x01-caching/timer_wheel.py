@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Hierarchical timer wheel: the expiry schedule of the caches.
+
+Time is cut into ticks of `resolution` seconds. Level 0 has one slot per
+tick for the next `slots` ticks, level 1 one slot per `slots` ticks, and
+so on, each level covering `slots` times the span of the one below.
+A key is filed in the lowest level whose span reaches its deadline, and
+every time the wheel reaches the start of a higher slot, the keys of
+that slot cascade down, so each key is moved at most once per level:
+scheduling, cancelling and expiring a key are O(1) amortized, and no
+scan over all the keys is ever needed. Deadlines are rounded up to the
+next tick, so a key is never reported before its deadline, but at most
+one tick after it.
+"""
+import math
+
+
+class TimerWheel():
+    """Schedules keys to expire at deadlines on a monotonic clock.
+    """
+    def __init__(self, start=0.0, resolution=1.0, slots=64, levels=4):
+        """Starts the wheel at the time `start`, in seconds.
+        Args:
+            start: The current time of the clock driving the wheel.
+            resolution: The length of a tick, in seconds.
+            slots: The number of slots of each level.
+            levels: The number of levels; deadlines beyond the
+            span of the top level are filed in its last slot and
+            rescheduled when it cascades.
+        """
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self.__now = math.floor(start / resolution)
+        self.__wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.__counts = [0] * levels
+        self.__where = {}
+        self.__due = {}
+
+    def __len__(self):
+        """The number of scheduled keys.
+        """
+        return len(self.__where)
+
+    def __file(self, key, tick):
+        """Files `key`, due at `tick`, in the lowest level reaching it.
+        """
+        if tick <= self.__now:
+            self.__due[key] = tick
+            self.__where[key] = None
+            return
+        span = 1
+        for level in range(self.levels):
+            if tick // span - self.__now // span < self.slots:
+                break
+            span *= self.slots
+        else:
+            span //= self.slots
+        slot = min(tick // span, self.__now // span + self.slots - 1)
+        slot %= self.slots
+        self.__wheels[level][slot][key] = tick
+        self.__counts[level] += 1
+        self.__where[key] = (level, slot)
+
+    def schedule(self, key, deadline):
+        """Schedules `key` to expire at `deadline`, replacing its
+        earlier deadline if any.
+        """
+        self.cancel(key)
+        self.__file(key, math.ceil(deadline / self.resolution))
+
+    def cancel(self, key):
+        """Unschedules `key`; does nothing if it is not scheduled.
+        """
+        if key not in self.__where:
+            return
+        where = self.__where.pop(key)
+        if where is None:
+            del self.__due[key]
+        else:
+            level, slot = where
+            del self.__wheels[level][slot][key]
+            self.__counts[level] -= 1
+
+    def advance(self, now):
+        """Moves the wheel to the time `now` and returns the keys whose
+        deadline has passed; they are no longer scheduled. Spans of
+        empty lower levels are skipped rather than walked tick by tick.
+        """
+        expired = []
+        target = math.floor(now / self.resolution)
+        while self.__now < target and self.__where:
+            span = 1
+            for count in self.__counts:
+                if count:
+                    break
+                span *= self.slots
+            tick = (self.__now // span + 1) * span
+            if tick > target:
+                break
+            self.__now = tick
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if tick % span == 0:
+                    self.__cascade(level, (tick // span) % self.slots)
+            self.__fire(self.__wheels[0][tick % self.slots], expired)
+        self.__now = max(self.__now, target)
+        for key in self.__due:
+            del self.__where[key]
+            expired.append(key)
+        self.__due.clear()
+        return expired
+
+    def __cascade(self, level, slot):
+        """Refiles the keys of a higher slot into the lower levels.
+        """
+        keys = self.__wheels[level][slot]
+        self.__wheels[level][slot] = {}
+        self.__counts[level] -= len(keys)
+        for key, tick in keys.items():
+            self.__file(key, tick)
+
+    def __fire(self, keys, expired):
+        """Expires the keys of a level 0 slot, refiling those only
+        parked there because their deadline is beyond the wheel.
+        """
+        self.__counts[0] -= len(keys)
+        later = []
+        for key, tick in keys.items():
+            del self.__where[key]
+            if tick > self.__now:
+                later.append((key, tick))
+            else:
+                expired.append(key)
+        keys.clear()
+        for key, tick in later:
+            self.__file(key, tick)